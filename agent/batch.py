@@ -0,0 +1,312 @@
+"""
+Пакетная обработка очереди обращений (письма, тикеты) через build_graph().
+
+Вход — JSONL, по обращению на строку: {"id": ..., "message": ..., "session_id": ...}
+(id по умолчанию — номер строки, вместо message допускаются text/question).
+Файл читается потоком в ограниченную очередь, её разбирают `concurrency`
+асинхронных воркеров. Результаты дописываются в выходной JSONL по мере готовности:
+{"id", "message", "response", "tools"} или {"id", "message", "error"}. Повторы
+одного и того же вопроса (после normalize_prompt) отвечаются один раз и
+помечаются "duplicate_of" — только если ответ построен на чистых инструментах
+(SHAREABLE_TOOLS: FAQ, поиск, приветствие). Ход с тикетом, действием на сайте и
+т.п. — личный для отправителя: повтор того же текста от другого клиента
+прогоняется заново и не получает чужой ответ.
+
+Возобновление после падения: выходной файл — журнал выполненного. В
+`<output>.checkpoint` периодически сохраняется смещение во входном файле, до
+которого всё обработано без ошибок; при перезапуске чтение начинается с него, а
+уже записанные id пропускаются. Записи с ошибкой checkpoint не сдвигают, так
+что при перезапуске они читаются и пробуются снова.
+
+Запуск:
+    python -m agent.batch inbox.jsonl answers.jsonl --concurrency 32 --llm stub
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+
+import orjson
+
+from agent.cache import normalize_prompt
+from agent.metrics import inc, observe
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_CHECKPOINT_EVERY = int(os.getenv("BATCH_CHECKPOINT_EVERY", "100"))  # записей между checkpoint
+MESSAGE_FIELDS = ("message", "text", "question")
+# ответ, построенный только на этих инструментах, не зависит от отправителя
+SHAREABLE_TOOLS = {"get_from_knowledge_base", "serper_search", "say_hello"}
+
+
+def _shareable(tools) -> bool:
+    return bool(tools) and all(t in SHAREABLE_TOOLS for t in tools)
+
+
+@dataclass
+class BatchReport:
+    processed: int = 0        # ответы, полученные от графа
+    deduplicated: int = 0     # повторы, отвеченные без прогона графа
+    errors: int = 0
+    skipped: int = 0          # уже были в выходном файле (возобновление)
+    invalid: int = 0          # строки без текста обращения или не JSON
+    elapsed_s: float = 0.0
+    latencies: list = field(default_factory=list, repr=False)
+
+    @property
+    def written(self) -> int:
+        return self.processed + self.deduplicated + self.errors
+
+    @property
+    def items_per_s(self) -> float:
+        return self.written / self.elapsed_s if self.elapsed_s else 0.0
+
+    def summary(self) -> dict:
+        out = {k: v for k, v in asdict(self).items() if k != "latencies"}
+        out["items_per_s"] = round(self.items_per_s, 2)
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            out["p50_ms"] = round(statistics.median(ordered) * 1e3, 1)
+            out["p95_ms"] = round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1e3, 1)
+        return out
+
+
+# ── файлы ───────────────────────────────────────────────────────────────
+def _checkpoint_path(output_path: str) -> str:
+    return f"{output_path}.checkpoint"
+
+
+def _load_checkpoint(output_path: str) -> tuple:
+    """(смещение во входном файле, номер строки), до которых всё обработано."""
+    try:
+        with open(_checkpoint_path(output_path), "rb") as f:
+            state = orjson.loads(f.read())
+        return int(state.get("input_offset", 0)), int(state.get("input_line", 0))
+    except (OSError, ValueError):
+        return 0, 0
+
+
+def _save_checkpoint(output_path: str, watermark: dict, report: BatchReport) -> None:
+    tmp = f"{_checkpoint_path(output_path)}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps({"input_offset": watermark["offset"], "input_line": watermark["line"],
+                              **report.summary()}))
+    os.replace(tmp, _checkpoint_path(output_path))
+
+
+def _load_done(output_path: str) -> dict:
+    """{id: запись} успешно обработанных; недописанная последняя строка обрезается."""
+    if not os.path.exists(output_path):
+        return {}
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)   # процесс упал посреди записи
+    done = {}
+    for line in data[:end].split(b"\n"):
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue
+        if "error" in record:
+            done.pop(str(record.get("id")), None)
+        else:
+            done[str(record.get("id"))] = record
+    return done
+
+
+def _parse(line: bytes, line_no: int):
+    try:
+        item = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(item, dict):
+        return None
+    message = next((item[k] for k in MESSAGE_FIELDS if item.get(k)), None)
+    if not isinstance(message, str):
+        return None
+    return {"id": str(item.get("id", line_no)), "message": message, "session_id": str(item.get("session_id", ""))}
+
+
+# ── прогон ──────────────────────────────────────────────────────────────
+class BatchRunner:
+    def __init__(self, graph=None, *, concurrency: int = BATCH_CONCURRENCY,
+                 checkpoint_every: int = BATCH_CHECKPOINT_EVERY, fsync: bool = False, progress=None):
+        if graph is None:
+            from agent.graph_builder import build_graph
+            graph = build_graph()
+        self.graph = graph
+        self.concurrency = concurrency
+        self.checkpoint_every = checkpoint_every
+        self.fsync = fsync
+        self.progress = progress   # progress(report) после каждого checkpoint
+
+    async def run(self, input_path: str, output_path: str, *, restart: bool = False) -> BatchReport:
+        if restart:
+            for path in (output_path, _checkpoint_path(output_path)):
+                if os.path.exists(path):
+                    os.remove(path)
+        done = _load_done(output_path)
+        start_offset, start_line = _load_checkpoint(output_path) if done else (0, 0)
+
+        report = BatchReport()
+        answers = {normalize_prompt(r["message"]): (r.get("duplicate_of", r["id"]), r["response"], r["tools"])
+                   for r in done.values() if "response" in r and "message" in r and _shareable(r.get("tools"))}
+        inflight = {}                    # ключ вопроса → Future (id, ответ, инструменты) или None — ответ личный
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        finished = {}                    # номер строки → смещение её конца
+        watermark = {"line": start_line, "offset": start_offset}
+        out = open(output_path, "ab")
+        started = time.perf_counter()
+
+        def advance(line_no: int, end_offset: int) -> None:
+            # checkpoint двигается только по непрерывному префиксу обработанных строк
+            finished[line_no] = end_offset
+            while watermark["line"] + 1 in finished:
+                watermark["line"] += 1
+                watermark["offset"] = finished.pop(watermark["line"])
+
+        def write(record: dict) -> None:
+            out.write(orjson.dumps(record) + b"\n")
+            out.flush()
+            if self.fsync:
+                os.fsync(out.fileno())
+            if report.written % self.checkpoint_every == 0:
+                report.elapsed_s = time.perf_counter() - started
+                _save_checkpoint(output_path, watermark, report)
+                if self.progress is not None:
+                    self.progress(report)
+
+        async def run(item: dict, key: str) -> tuple:
+            t0 = time.perf_counter()
+            state = await self.graph.ainvoke({"user_input": item["message"], "session_id": item["session_id"]})
+            tools = [c["tool"] for c in state.get("calls") or ()]
+            result = (item["id"], state["response"], tools)
+            if _shareable(tools):
+                answers[key] = result
+            report.latencies.append(time.perf_counter() - t0)
+            observe("batch_item_seconds", time.perf_counter() - t0)
+            return result
+
+        async def answer(item: dict):
+            """((id первого, ответ, инструменты), повтор ли)."""
+            key = normalize_prompt(item["message"])
+            if key in answers:
+                return answers[key], True
+            if key in inflight:
+                shared = await asyncio.shield(inflight[key])
+                if shared is not None:
+                    return shared, True
+                return await run(item, key), False   # первый ответ личный — свой прогон
+            future = inflight[key] = asyncio.get_running_loop().create_future()
+            try:
+                result = await run(item, key)
+                future.set_result(result if _shareable(result[2]) else None)
+                return result, False
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()   # ошибку получат и ждущие повторы; не логировать как «забытую»
+                raise
+            finally:
+                inflight.pop(key, None)
+
+        async def worker():
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                line_no, end_offset, item = entry
+                record = {"id": item["id"], "message": item["message"]}
+                try:
+                    (first_id, response, tools), duplicate = await answer(item)
+                    record["response"], record["tools"] = response, tools
+                    if duplicate:
+                        record["duplicate_of"] = first_id
+                        report.deduplicated += 1
+                    else:
+                        report.processed += 1
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+                    report.errors += 1
+                inc("batch_items", status="error" if "error" in record else
+                    "duplicate" if "duplicate_of" in record else "ok")
+                write(record)
+                if "error" not in record:
+                    # checkpoint не уходит дальше строки с ошибкой — при перезапуске она прочитается снова
+                    advance(line_no, end_offset)
+
+        async def read():
+            with open(input_path, "rb") as f:
+                f.seek(start_offset)
+                offset, line_no = start_offset, start_line
+                for line in f:
+                    offset += len(line)
+                    line_no += 1          # с 1, как в редакторе; он же id по умолчанию
+                    item = _parse(line, line_no) if line.strip() else None
+                    if item is None:
+                        report.invalid += bool(line.strip())
+                        advance(line_no, offset)
+                    elif item["id"] in done:
+                        report.skipped += 1
+                        advance(line_no, offset)
+                    else:
+                        await queue.put((line_no, offset, item))
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        # чтение и воркеры — отдельные задачи: если воркер упал, чтение не зависнет на полной очереди
+        tasks = [asyncio.create_task(read())] + [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+            report.elapsed_s = time.perf_counter() - started
+            _save_checkpoint(output_path, watermark, report)
+            out.close()
+        return report
+
+
+def run_batch(input_path: str, output_path: str, graph=None, **kwargs) -> BatchReport:
+    restart = kwargs.pop("restart", False)
+    return asyncio.run(BatchRunner(graph, **kwargs).run(input_path, output_path, restart=restart))
+
+
+def _build_graph(llm: str, stub_latency: float):
+    from agent.graph_builder import build_graph
+
+    if llm == "none":
+        return build_graph()
+    if llm == "stub":
+        from agent.stub_llm import StubLLM
+        return build_graph(llm=StubLLM(latency=stub_latency))
+    from agent.llm import get_llm
+    return build_graph(llm=get_llm())
+
+
+if __name__ == "__main__":
+    from agent.log import configure_logging
+
+    parser = argparse.ArgumentParser(description="Пакетная обработка обращений из JSONL")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--checkpoint-every", type=int, default=BATCH_CHECKPOINT_EVERY)
+    parser.add_argument("--llm", choices=("gemini", "stub", "none"), default="gemini",
+                        help="stub — заглушка без сети, none — ответ равен выводу инструмента")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--fsync", action="store_true", help="fsync после каждой записи")
+    parser.add_argument("--restart", action="store_true", help="начать заново, удалив результаты")
+    args = parser.parse_args()
+
+    configure_logging()
+    report = run_batch(
+        args.input, args.output, _build_graph(args.llm, args.stub_latency),
+        concurrency=args.concurrency, checkpoint_every=args.checkpoint_every, fsync=args.fsync,
+        restart=args.restart,
+        progress=lambda r: print(f"… {r.written} записей, {r.items_per_s:.1f}/с", flush=True),
+    )
+    print(report.summary())
@@ -0,0 +1,229 @@
+"""
+Кэш ответов агента и чистых инструментов.
+
+Два уровня: LRU с TTL в памяти процесса и необязательный SQLite-файл на диске
+(CACHE_DB_PATH), общий для перезапусков и нескольких воркеров. Ключ — имя
+пространства (инструмент или "agent") плюс нормализованные аргументы; для
+записей, зависящих от базы знаний, в ключ входит версия knowledge_base.json,
+поэтому после правки файла старые ответы просто перестают находиться.
+
+Счётчики попаданий/промахов по пространствам — `get_cache().stats()`.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import orjson
+
+from agent.metrics import inc
+
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "4096"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "3600"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH")  # не задан — только кэш в памяти
+
+_TRAILING_RE = re.compile(r"[?!.\s]+$")
+
+
+def normalize_prompt(text: str) -> str:
+    """«Сколько стоит доставка?» и «сколько  стоит доставка» дают один ключ.
+
+    Складываются только регистр, ё/е, пробелы и финальные ?!. — операторы,
+    символы и валюты остаются: «C++» ≠ «C», «2+2» ≠ «2*2», «$» ≠ «€».
+    """
+    text = " ".join(str(text).lower().replace("ё", "е").split())
+    return _TRAILING_RE.sub("", text)
+
+
+def make_key(namespace: str, *args, **kwargs) -> str:
+    norm = [normalize_prompt(a) if isinstance(a, str) else a for a in args]
+    norm_kw = {k: normalize_prompt(v) if isinstance(v, str) else v for k, v in sorted(kwargs.items())}
+    raw = orjson.dumps([namespace, norm, norm_kw], option=orjson.OPT_SORT_KEYS)
+    return f"{namespace}:{hashlib.sha256(raw).hexdigest()}"
+
+
+class _Missing:
+    pass
+
+
+MISSING = _Missing()
+
+
+# ── уровни ──────────────────────────────────────────────────────────────
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_MAXSIZE, ttl: float = CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key → (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self, namespace: str = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k.startswith(namespace + ":")]:
+                    del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Дисковый уровень на SQLAlchemy; значения хранятся как JSON."""
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL):
+        from sqlalchemy import Column, Float, LargeBinary, MetaData, String, Table, create_engine
+
+        self.ttl = ttl
+        self.engine = create_engine(f"sqlite:///{path}")
+        metadata = MetaData()
+        self.table = Table(
+            "cache_entries", metadata,
+            Column("key", String, primary_key=True),
+            Column("value", LargeBinary, nullable=False),
+            Column("expires_at", Float, nullable=False, index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def get(self, key: str):
+        from sqlalchemy import select
+
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.value).where(self.table.c.key == key, self.table.c.expires_at >= time.time())
+            ).first()
+        return MISSING if row is None else orjson.loads(row[0])
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        from sqlalchemy.dialects.sqlite import insert
+
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        stmt = insert(self.table).values(key=key, value=orjson.dumps(value), expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(index_elements=["key"], set_={
+            "value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at,
+        })
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def clear(self, namespace: str = None) -> None:
+        from sqlalchemy import delete
+
+        stmt = delete(self.table)
+        if namespace is not None:
+            stmt = stmt.where(self.table.c.key.startswith(namespace + ":"))
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def purge_expired(self) -> None:
+        from sqlalchemy import delete
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.expires_at < time.time()))
+
+
+# ── каскад ──────────────────────────────────────────────────────────────
+class LayeredCache:
+    def __init__(self, memory: LRUCache = None, disk: SQLiteCache = None):
+        self.memory = memory or LRUCache()
+        self.disk = disk
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, field: str) -> None:
+        namespace = key.rsplit(":", 1)[0]
+        with self._stats_lock:
+            counters = self._stats.setdefault(namespace, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+            counters[field] += 1
+        inc("cache_lookups", namespace=namespace, result=field)
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count(key, "memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+                self._count(key, "disk_hits")
+                return value
+        self._count(key, "misses")
+        return MISSING
+
+    def set(self, key: str, value, ttl: float = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def invalidate(self, namespace: str = None) -> None:
+        self.memory.clear(namespace)
+        if self.disk is not None:
+            self.disk.clear(namespace)
+
+    def stats(self) -> dict:
+        """{пространство: {memory_hits, disk_hits, misses}} — сколько вызовов LLM/Serper сэкономлено."""
+        with self._stats_lock:
+            return {ns: dict(c) for ns, c in self._stats.items()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LayeredCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LayeredCache(LRUCache(), SQLiteCache(CACHE_DB_PATH) if CACHE_DB_PATH else None)
+        return _cache
+
+
+def kb_version() -> str:
+    from agent.knowledge_base import get_knowledge_base
+
+    try:
+        return "%d-%d" % get_knowledge_base().version
+    except (FileNotFoundError, ValueError):
+        return "missing"
+
+
+def cached(namespace: str, ttl: float = None, kb_dependent: bool = False, cache_if=None):
+    """Кэширует чистую функцию; cache_if(result) -> bool отсекает, например, ошибки."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            extra = {"_kb": kb_version()} if kb_dependent else {}
+            key = make_key(namespace, *args, **kwargs, **extra)
+            value = cache.get(key)
+            if value is not MISSING:
+                return value
+            value = fn(*args, **kwargs)
+            if cache_if is None or cache_if(value):
+                cache.set(key, value, ttl)
+            return value
+        return wrapper
+    return decorator
@@ -1,53 +1,186 @@
 """
-Полный файл с авто-регистрацией всех инструментов из каталога tools/.
+Граф агента planner → executor → responder поверх реестра инструментов tools/.
+
+Инструменты и LLM подгружаются лениво: импорт модуля не тянет langgraph,
+модули инструментов и клиент Gemini (см. tools.registry и agent.llm.get_llm).
+
+При прогоне через stream/astream узлы пишут события хода — план, старт и
+ответ инструментов, токены ответа (см. agent.streaming). Время каждого узла —
+в гистограмме graph_node_seconds{node=...} (см. agent.metrics).
 """
 
-import os, importlib, pkgutil
-from dotenv import load_dotenv
+from typing import TypedDict
+
+from tools import registry  # noqa: F401  (реестр с ленивой загрузкой по манифесту)
+from agent.llm import llm_slot
+from agent.metrics import record_llm, timed
+from agent.router import Router
+from agent.streaming import chunk_text, emit
+from agent.tool_runner import arun_calls, merge_outputs, run_calls
 
-from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-# ── ключ ────────────────────────────────────────────────────────────────
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise RuntimeError("GOOGLE_API_KEY не найден! Проверь .env или переменные окружения.")
+def __getattr__(name):
+    # совместимость: раньше `llm` создавался при импорте модуля
+    if name == "llm":
+        from agent.llm import get_llm
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# ── авто-импорт инструментов ────────────────────────────────────────────
-from tools import registry, __path__ as tools_path  # noqa: E402  (после установки PYTHONPATH)
 
-for mod in pkgutil.iter_modules(tools_path):
-    importlib.import_module(f"tools.{mod.name}")
+# ── состояние ───────────────────────────────────────────────────────────
+class AgentState(TypedDict, total=False):
+    user_input: str
+    session_id: str
+    calls: list            # [{"tool": имя в registry, "args": str | dict}]
+    route_source: str
+    tool_outputs: list
+    tool_output: str
+    response: str
 
-# ── LLM ─────────────────────────────────────────────────────────────────
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    google_api_key=GOOGLE_API_KEY,
+
+RESPONDER_SYSTEM = (
+    "Ты полезный AI-агент поддержки клиентов. Ответь клиенту дружелюбно и по делу, "
+    "опираясь на результат инструмента."
 )
 
+
+# маршруты, где намерение распознано без LLM: ответом служит вывод инструмента
+FAST_ROUTE_SOURCES = {"rule", "kb", "mixed"}
+
+router = Router()
+
+
 # ── узлы графа ──────────────────────────────────────────────────────────
+def _plan(routes: list) -> dict:
+    # правило + FAQ в одном ходе дают "mixed" — это тоже ход без LLM
+    source = routes[0].source if all(r.source == routes[0].source for r in routes) else "mixed"
+    emit({"type": "plan", "tools": [r.tool for r in routes], "source": source})
+    return {"calls": [{"tool": r.tool, "args": r.args} for r in routes], "route_source": source}
+
+
+@timed("graph_node", node="planner")
 def planner(state: dict) -> dict:
-    return {"action": "say_hello", "args": state["user_input"]}
+    return _plan(router.plan(state["user_input"]))
+
+
+def make_planner(rt: Router):
+    """Планировщик с собственным маршрутизатором (в т.ч. с LLM-фолбэком)."""
+    from langchain_core.runnables import RunnableLambda
+
+    @timed("graph_node", node="planner")
+    def plan(state: dict) -> dict:
+        return _plan(rt.plan(state["user_input"]))
+
+    @timed("graph_node", node="planner")
+    async def aplan(state: dict) -> dict:
+        return _plan(await rt.aplan(state["user_input"]))
+
+    return RunnableLambda(plan, afunc=aplan, name="planner")
+
+
+def _merge(calls: list, outputs: list) -> dict:
+    return {
+        "tool_outputs": [{"tool": c["tool"], "output": o} for c, o in zip(calls, outputs)],
+        "tool_output": merge_outputs(outputs),
+    }
+
+
+def _tools_started(calls: list) -> None:
+    for c in calls:
+        emit({"type": "tool_start", "tool": c["tool"]})
+
 
+def _tool_done(call: dict, output) -> None:
+    emit({"type": "tool_end", "tool": call["tool"], "output": str(output)})
 
+
+# все вызовы хода выполняются одновременно: async-инструменты — в цикле событий,
+# синхронные — в пуле потоков, у каждого свой таймаут
+@timed("graph_node", node="executor")
 def executor(state: dict) -> dict:
-    tool_fn = registry.get(state["action"])
-    if not tool_fn:
-        return {"tool_output": f"⚠️ Неизвестный инструмент: {state['action']}"}
-    return {"tool_output": tool_fn(state["args"])}
+    _tools_started(state["calls"])
+    return _merge(state["calls"], run_calls(state["calls"], on_done=_tool_done))
 
 
-def responder(state: dict) -> dict:
+@timed("graph_node", node="executor")
+async def aexecutor(state: dict) -> dict:
+    _tools_started(state["calls"])
+    return _merge(state["calls"], await arun_calls(state["calls"], on_done=_tool_done))
+
+
+def _echo(state: dict) -> dict:
+    emit({"type": "token", "content": state["tool_output"]})
     return {"response": state["tool_output"]}
 
 
+@timed("graph_node", node="responder")
+def responder(state: dict) -> dict:
+    return _echo(state)
+
+
+def _responder_messages(state: dict) -> list:
+    return [
+        ("system", RESPONDER_SYSTEM),
+        ("human", f"Вопрос клиента: {state['user_input']}\nРезультат инструмента: {state['tool_output']}"),
+    ]
+
+
+def _stream_chunk(reply, chunk):
+    """Отправляет фрагмент ответа в поток и копит его (вместе с usage_metadata)."""
+    text = chunk_text(chunk)
+    if text:
+        emit({"type": "token", "content": text})
+    return chunk if reply is None else reply + chunk
+
+
+def make_responder(model):
+    """Ответчик, формулирующий ответ через LLM (sync- и async-вариант для invoke/ainvoke).
+
+    Ответ модели читается потоком: каждый фрагмент сразу уходит событием token.
+    Для ходов, распознанных правилами или базой знаний, LLM не вызывается.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    @timed("graph_node", node="responder")
+    def respond(state: dict) -> dict:
+        if state.get("route_source") in FAST_ROUTE_SOURCES:
+            return _echo(state)
+        reply = None
+        for chunk in model.stream(_responder_messages(state)):
+            reply = _stream_chunk(reply, chunk)
+        record_llm("responder", reply)
+        return {"response": chunk_text(reply) if reply is not None else ""}
+
+    @timed("graph_node", node="responder")
+    async def arespond(state: dict) -> dict:
+        if state.get("route_source") in FAST_ROUTE_SOURCES:
+            return _echo(state)
+        reply = None
+        async with llm_slot():
+            async for chunk in model.astream(_responder_messages(state)):
+                reply = _stream_chunk(reply, chunk)
+        record_llm("responder", reply)
+        return {"response": chunk_text(reply) if reply is not None else ""}
+
+    return RunnableLambda(respond, afunc=arespond, name="responder")
+
+
 # ── сборка графа ────────────────────────────────────────────────────────
-def build_graph():
-    g = StateGraph(input=dict, output=dict)
-    g.add_node("planner", planner)
-    g.add_node("executor", executor)
-    g.add_node("responder", responder)
+def build_graph(llm=None, router: Router = None):
+    """llm=None — ответ равен выводу инструмента; иначе его формулирует переданная модель.
+
+    router — свой маршрутизатор (например, чтобы читать его stats()); по умолчанию
+    без LLM используется общий `router`, с LLM — новый Router(llm=llm).
+    """
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, END
+
+    if router is None and llm is not None:
+        router = Router(llm=llm)
+    g = StateGraph(AgentState)
+    g.add_node("planner", planner if router is None else make_planner(router))
+    g.add_node("executor", RunnableLambda(executor, afunc=aexecutor, name="executor"))
+    g.add_node("responder", responder if llm is None else make_responder(llm))
 
     g.set_entry_point("planner")
     g.add_edge("planner", "executor")
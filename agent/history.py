@@ -0,0 +1,160 @@
+"""
+История диалога для промпта в пределах бюджета токенов.
+
+В промпт идут резюме старой части разговора и скользящее окно последних
+реплик. Когда окно превышает HISTORY_TOKEN_BUDGET, самые старые ходы
+сворачиваются в резюме, пока окно не опустится до нижней отметки
+(HISTORY_LOW_WATERMARK от бюджета) — так резюмирование случается раз в
+несколько ходов, а не на каждом. Резюме обновляется инкрементально (старое
+резюме + вытесненные реплики) и дописывается в JSONL сессии записью
+{"type": "summary", "content", "upto", "keep"}, поэтому переживает перезапуск;
+keep — сколько реплик перед этой записью остались в окне.
+"""
+
+import os
+import threading
+
+from agent.metrics import record_llm
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_LOW_WATERMARK = float(os.getenv("HISTORY_LOW_WATERMARK", "0.6"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "400"))
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "3"))  # грубо для русского текста
+HISTORY_LOAD_RECORDS = int(os.getenv("HISTORY_LOAD_RECORDS", "400"))
+
+SUMMARY_PREFIX = "Краткое содержание предыдущего разговора: "
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def is_summary(record: dict) -> bool:
+    return record.get("type") == "summary"
+
+
+# ── резюмирование ───────────────────────────────────────────────────────
+class ExtractiveSummarizer:
+    """Без LLM: начала вытесненных реплик, старейшие отбрасываются сверх бюджета."""
+
+    def __init__(self, max_tokens: int = SUMMARY_TOKEN_BUDGET, snippet_chars: int = 120,
+                 count_tokens=estimate_tokens):
+        self.max_tokens = max_tokens
+        self.snippet_chars = snippet_chars
+        self.count_tokens = count_tokens
+
+    def __call__(self, summary: str, messages: list) -> str:
+        lines = summary.splitlines() if summary else []
+        for m in messages:
+            text = " ".join(m["content"].split())
+            lines.append(f"{m['role']}: {text[:self.snippet_chars]}")
+        while len(lines) > 1 and self.count_tokens("\n".join(lines)) > self.max_tokens:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+class LLMSummarizer:
+    PROMPT = (
+        "Обнови краткое резюме разговора клиента со службой поддержки. Сохрани имя, контакты, "
+        "предпочтения, номера заказов и нерешённые вопросы. Не более {words} слов.\n\n"
+        "Текущее резюме:\n{summary}\n\nНовые реплики:\n{messages}"
+    )
+
+    def __init__(self, llm, max_tokens: int = SUMMARY_TOKEN_BUDGET):
+        self.llm = llm
+        self.max_tokens = max_tokens
+
+    def __call__(self, summary: str, messages: list) -> str:
+        prompt = self.PROMPT.format(
+            words=max(20, self.max_tokens // 2),
+            summary=summary or "(пусто)",
+            messages="\n".join(f"{m['role']}: {m['content']}" for m in messages),
+        )
+        reply = self.llm.invoke(prompt)
+        record_llm("summarizer", reply)
+        return str(reply.content).strip()
+
+
+# ── окно истории ────────────────────────────────────────────────────────
+class _SessionHistory:
+    def __init__(self, summary: str, folded: int, window: list):
+        self.summary = summary
+        self.folded = folded      # сколько реплик от начала сессии уже в резюме
+        self.window = window
+        self.tokens = 0
+
+
+class HistoryManager:
+    def __init__(self, store, budget_tokens: int = HISTORY_TOKEN_BUDGET, summarizer=None,
+                 low_watermark: float = HISTORY_LOW_WATERMARK, count_tokens=estimate_tokens):
+        self.store = store
+        self.budget_tokens = budget_tokens
+        self.low_tokens = int(budget_tokens * low_watermark)
+        self.summarizer = summarizer or ExtractiveSummarizer(count_tokens=count_tokens)
+        self.count_tokens = count_tokens
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _message_tokens(self, m: dict) -> int:
+        return self.count_tokens(m["content"]) + 4  # + служебные токены роли
+
+    def _load(self, session_id: str) -> _SessionHistory:
+        with self._lock:
+            state = self._sessions.get(session_id)
+        if state is not None:
+            return state
+
+        records = self.store.load_recent(session_id, HISTORY_LOAD_RECORDS)
+        summary, folded, window = "", 0, [r for r in records if not is_summary(r)]
+        for i in range(len(records) - 1, -1, -1):
+            if is_summary(records[i]):
+                rec = records[i]
+                summary, folded = rec["content"], rec.get("upto", 0)
+                # окно на момент сворачивания — последние `keep` реплик перед записью резюме
+                before = [r for r in records[:i] if not is_summary(r)]
+                keep = rec.get("keep", 0)
+                window = (before[-keep:] if keep else []) + [r for r in records[i + 1:] if not is_summary(r)]
+                break
+        state = _SessionHistory(summary, folded, window)
+        state.tokens = sum(self._message_tokens(m) for m in window)
+        if state.tokens > self.budget_tokens:
+            self._fold(session_id, state)
+        with self._lock:
+            return self._sessions.setdefault(session_id, state)
+
+    def _fold(self, session_id: str, state: _SessionHistory) -> None:
+        """Сворачивает старейшие ходы в резюме, пока окно не опустится до нижней отметки."""
+        evicted = []
+        while state.window and state.tokens > self.low_tokens:
+            # парами user+ai, чтобы окно не начиналось с ответа без вопроса
+            for _ in range(2 if len(state.window) > 1 else 1):
+                m = state.window.pop(0)
+                state.tokens -= self._message_tokens(m)
+                evicted.append(m)
+        if not evicted:
+            return
+        state.summary = self.summarizer(state.summary, evicted)
+        state.folded += len(evicted)
+        self.store.append(session_id, {"type": "summary", "content": state.summary,
+                                       "upto": state.folded, "keep": len(state.window)})
+
+    # ── API ─────────────────────────────────────────────────────────────
+    def prompt_messages(self, session_id: str) -> list:
+        """История для {chat_history}: резюме (если есть) + окно последних реплик."""
+        state = self._load(session_id)
+        messages = list(state.window)
+        if state.summary:
+            messages.insert(0, {"role": "system", "content": SUMMARY_PREFIX + state.summary})
+        return messages
+
+    def add_turn(self, session_id: str, user_input: str, output: str) -> None:
+        state = self._load(session_id)
+        turn = [{"role": "user", "content": user_input}, {"role": "ai", "content": output}]
+        self.store.append(session_id, *turn)
+        state.window.extend(turn)
+        state.tokens += sum(self._message_tokens(m) for m in turn)
+        if state.tokens > self.budget_tokens:
+            self._fold(session_id, state)
+
+    def prompt_tokens(self, session_id: str) -> int:
+        return sum(self._message_tokens(m) for m in self.prompt_messages(session_id))
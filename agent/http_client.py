@@ -0,0 +1,205 @@
+"""
+Общий HTTP-клиент внешних инструментов (Serper, бэкенд сайта).
+
+- один пул соединений httpx на процесс: keep-alive вместо TCP/TLS-рукопожатия
+  на каждый вызов, таймауты на подключение и на весь запрос;
+- ограничение частоты — token bucket на хост (HTTP_RATE_LIMIT запросов/с,
+  всплеск до HTTP_RATE_BURST), чтобы не выбивать квоты внешних API;
+- повторы через tenacity с экспоненциальной паузой со случайным разбросом —
+  при сетевых ошибках, 429 и 5xx;
+- одинаковые запросы, выполняющиеся одновременно, склеиваются: к серверу уходит
+  один, остальные ждут его результат.
+
+Инструменты синхронные (выполняются в пуле потоков, см. agent.tool_runner),
+поэтому и клиент синхронный и потокобезопасный.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import httpx
+from tenacity import retry_if_exception, stop_after_attempt, wait_random_exponential, Retrying
+
+from agent.metrics import inc, timer
+
+log = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.2"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "5"))
+HTTP_RATE_LIMIT = float(os.getenv("HTTP_RATE_LIMIT", "10"))  # запросов/с на хост, 0 — без ограничения
+HTTP_RATE_BURST = int(os.getenv("HTTP_RATE_BURST", "20"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableStatus(httpx.HTTPStatusError):
+    """Ответ, который стоит повторить (429/5xx)."""
+
+
+# ── ограничение частоты ─────────────────────────────────────────────────
+class TokenBucket:
+    """rate токенов в секунду, не больше capacity в запасе; acquire ждёт токен."""
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Берёт токен (возможно, в долг) и возвращает, сколько ждать до него."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> float:
+        wait = self._reserve()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+# ── клиент ──────────────────────────────────────────────────────────────
+def _is_retryable(error: BaseException) -> bool:
+    return isinstance(error, (httpx.TransportError, RetryableStatus))
+
+
+class HttpClient:
+    def __init__(self, *, timeout: float = HTTP_TIMEOUT, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 max_connections: int = HTTP_MAX_CONNECTIONS, max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF, backoff_max: float = HTTP_BACKOFF_MAX,
+                 rate_limit: float = HTTP_RATE_LIMIT, rate_burst: int = HTTP_RATE_BURST, transport=None):
+        self._client = httpx.Client(
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            transport=transport,
+        )
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self._buckets = {}       # хост → TokenBucket
+        self._inflight = {}      # ключ запроса → Future
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "coalesced": 0, "throttled_s": 0.0}
+
+    # ── ограничения ─────────────────────────────────────────────────────
+    def set_rate_limit(self, host: str, rate: float, burst: int = None) -> None:
+        """Отдельный лимит для хоста (например, по квоте Serper); rate=0 — без ограничения."""
+        with self._lock:
+            self._buckets[host] = TokenBucket(rate, burst or self.rate_burst) if rate > 0 else None
+
+    def _bucket(self, host: str):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_limit, self.rate_burst) if self.rate_limit > 0 else None
+            return self._buckets[host]
+
+    # ── запрос ──────────────────────────────────────────────────────────
+    def _send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        host = urlsplit(url).netloc
+        bucket = self._bucket(host)
+        if bucket is not None:
+            waited = bucket.acquire()
+            if waited:
+                with self._lock:
+                    self._stats["throttled_s"] += waited
+        with self._lock:
+            self._stats["requests"] += 1
+        with timer("http_request", host=host):
+            response = self._client.request(method, url, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableStatus(f"HTTP {response.status_code}", request=response.request, response=response)
+        response.raise_for_status()
+        return response
+
+    def _send_with_retries(self, method: str, url: str, **kwargs):
+        def count_retry(state):
+            with self._lock:
+                self._stats["retries"] += 1
+            inc("http_retries", host=urlsplit(url).netloc)
+            log.info("Повтор %s %s (попытка %d): %s", method, url, state.attempt_number,
+                     state.outcome.exception())
+
+        retrying = Retrying(
+            retry=retry_if_exception(_is_retryable),
+            stop=stop_after_attempt(self.retries + 1),
+            wait=wait_random_exponential(multiplier=self.backoff, max=self.backoff_max),
+            before_sleep=count_retry,
+            reraise=True,
+        )
+        response = retrying(self._send, method, url, **kwargs)
+        return response.json() if response.content else None
+
+    def request(self, method: str, url: str, *, params: dict = None, json_body=None,
+                headers: dict = None, timeout: float = None, coalesce: bool = None):
+        """JSON ответа; после исчерпания повторов — исключение httpx.
+
+        coalesce — склеивать одинаковые одновременные запросы (по умолчанию для GET/HEAD;
+        для POST включайте, только если запрос идемпотентен, как поиск).
+        """
+        method = method.upper()
+        kwargs = {"params": params, "json": json_body, "headers": headers}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if coalesce is None:
+            coalesce = method in ("GET", "HEAD")
+        if not coalesce:
+            return self._send_with_retries(method, url, **kwargs)
+
+        key = json.dumps([method, url, params, json_body, sorted((headers or {}).items())],
+                         sort_keys=True, ensure_ascii=False, default=str)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(self._send_with_retries(method, url, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> HttpClient:
+    """Общий клиент процесса: один пул соединений для всех инструментов."""
+    return HttpClient()
@@ -0,0 +1,279 @@
+"""
+База знаний FAQ (knowledge_base.json), загружаемая один раз и индексируемая в памяти.
+
+Файл перечитывается автоматически, когда меняется его mtime/размер, поэтому
+обновление базы не требует перезапуска агента. Помимо точного поиска и поиска
+по подстроке есть ранжированный BM25-поиск (`KnowledgeBase.search`) для
+свободных формулировок клиента.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from functools import cached_property, lru_cache
+
+KB_PATH = os.getenv("KNOWLEDGE_BASE_PATH", "knowledge_base.json")
+KB_TOP_K = int(os.getenv("KB_TOP_K", "3"))
+KB_SCORE_THRESHOLD = float(os.getenv("KB_SCORE_THRESHOLD", "0.35"))
+
+NGRAM = 3  # длина n-граммы в индексе подстрок
+
+# ── нормализация для ранжирования ───────────────────────────────────────
+BM25_K1 = 1.2
+BM25_B = 0.75
+# вес поля при подсчёте tf: вопрос важнее категории и ответа
+FIELD_WEIGHTS = (("question", 1.0), ("category", 0.5), ("answer", 0.3))
+
+_WORD_RE = re.compile(r"\w+")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+
+STOP_WORDS = frozenset("""
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по
+    только ее мне было вот от меня еще нет о из ему теперь даже ну ли если уже или ни
+    быть был него до вас нибудь опять уж вам ведь там потом себя ничего ей может они
+    тут где есть надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже
+    себе под будет ж тогда кто этот того потому этого совсем ним здесь этом почти
+    тем чтобы нее сейчас были куда зачем всех никогда можно при об хоть после над
+    больше тот через эти нас про всего них много разве эту впрочем этой перед
+    иногда чуть том нельзя им более всегда между мой моя мое мои пожалуйста
+    хочу хотел хотела подскажите скажите здравствуйте привет
+""".split())
+
+# окончания для грубого стемминга, от длинных к коротким
+_ENDINGS = sorted("""
+    иями ями ами иях ях ах ией ей ов ев ий ый ой ая яя ое ее ие ые ого его ому ему
+    ыми ими ую юю ом ем ам ям их ых ться тся ешь ет ют ут ит ат ят ть ла ло ли
+    ение ения ению ением ость ости остью а я о е и ы у ю ь й
+""".split(), key=len, reverse=True)
+_MIN_STEM = 3
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр + схлопывание пробелов (тот же ключ, что и для точного совпадения)."""
+    return " ".join(str(text).lower().split())
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Отрезает типичное русское окончание (хватает для сопоставления словоформ в FAQ).
+
+    Словарь обращений невелик и сильно повторяется — результат кэшируется по слову.
+    """
+    if not _CYRILLIC_RE.search(word):
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Токены для BM25: нижний регистр, ё→е, без стоп-слов, со стеммингом."""
+    words = _WORD_RE.findall(str(text).lower().replace("ё", "е"))
+    return [stem(w) for w in words if w not in STOP_WORDS]
+
+
+def format_entry(item: dict) -> str:
+    return f"Категория: {item['category']}\nВопрос: {item['question']}\nОтвет: {item['answer']}"
+
+
+def _ngrams(text: str):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class _BM25Index:
+    """Статистики BM25 одной версии базы.
+
+    Для каждого терма заранее посчитан вклад в оценку каждой записи (impact),
+    поэтому поиск — это сумма по спискам вхождений терминов запроса и
+    ограниченная куча на k лучших.
+    """
+
+    def __init__(self, items: list):
+        n = len(items)
+        doc_tfs, lengths = [], []
+        for it in items:
+            tf = {}
+            for field, weight in FIELD_WEIGHTS:
+                for term in tokenize(it.get(field, "")):
+                    tf[term] = tf.get(term, 0.0) + weight
+            doc_tfs.append(tf)
+            lengths.append(sum(tf.values()))
+        avgdl = (sum(lengths) / n) if n else 1.0
+
+        df = {}
+        for tf in doc_tfs:
+            for term in tf:
+                df[term] = df.get(term, 0) + 1
+        self.n = n
+        self.idf = {t: self._idf(d) for t, d in df.items()}
+        self.unseen_idf = self._idf(0)
+
+        self.postings = {}
+        for i, (tf, dl) in enumerate(zip(doc_tfs, lengths)):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * dl / (avgdl or 1.0))
+            for term, f in tf.items():
+                impact = self.idf[term] * f * (BM25_K1 + 1) / (f + norm)
+                self.postings.setdefault(term, []).append((i, impact))
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.n - df + 0.5) / (df + 0.5))
+
+    def top(self, query: str, k: int) -> list:
+        """[(оценка 0..1, номер записи)] по убыванию оценки.
+
+        Оценка нормирована на сумму idf терминов запроса — столько набирает
+        запись средней длины, где каждый термин встречается ровно один раз.
+        Термины, которых нет в базе, тоже входят в знаменатель и снижают оценку.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        scores = {}
+        for term in terms:
+            for i, impact in self.postings.get(term, ()):
+                scores[i] = scores.get(i, 0.0) + impact
+        if not scores:
+            return []
+        ref = sum(self.idf.get(t, self.unseen_idf) for t in terms)
+        best = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+        return [(min(score / ref, 1.0), i) for i, score in best]
+
+
+class _Snapshot:
+    """Неизменяемый индекс одной версии файла; заменяется целиком при перезагрузке."""
+
+    def __init__(self, items: list, version: tuple):
+        self.items = items
+        self.version = version
+        self.questions = [normalize(it.get("question", "")) for it in items]
+        self.categories = [normalize(it.get("category", "")) for it in items]
+
+        # точное совпадение: нормализованный вопрос → первая запись с ним
+        self.exact = {}
+        for i, q in enumerate(self.questions):
+            self.exact.setdefault(q, i)
+
+        # n-граммы вопроса и категории → номера записей (по возрастанию)
+        self.postings = {}
+        for i, (q, c) in enumerate(zip(self.questions, self.categories)):
+            for gram in _ngrams(q) | _ngrams(c):
+                self.postings.setdefault(gram, []).append(i)
+
+    def candidates(self, query: str):
+        grams = _ngrams(query)
+        if not grams:  # запрос короче n-граммы — только полный проход
+            return range(len(self.items))
+        rarest = min(grams, key=lambda g: len(self.postings.get(g, ())))
+        return self.postings.get(rarest, ())
+
+    @cached_property
+    def bm25(self) -> _BM25Index:
+        # строится при первом ранжированном запросе к этой версии файла
+        return _BM25Index(self.items)
+
+
+class KnowledgeBase:
+    def __init__(self, path: str = KB_PATH):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    # ── загрузка ────────────────────────────────────────────────────────
+    def _stat(self) -> tuple:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _current(self) -> _Snapshot:
+        """Возвращает актуальный индекс, перечитывая файл при изменении."""
+        snap = self._snapshot
+        try:
+            version = self._stat()
+        except FileNotFoundError:
+            if snap is None:
+                raise
+            return snap
+        if snap is not None and snap.version == version:
+            return snap
+
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and snap.version == version:
+                return snap
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    items = json.load(f)
+            except json.JSONDecodeError:
+                # файл могли поймать посреди записи — продолжаем отдавать прошлую версию
+                if snap is None:
+                    raise
+                return snap
+            self._snapshot = _Snapshot(items, version)
+            return self._snapshot
+
+    def reload(self) -> None:
+        with self._lock:
+            self._snapshot = None
+        self._current()
+
+    @property
+    def version(self) -> tuple:
+        return self._current().version
+
+    @property
+    def items(self) -> list:
+        return self._current().items
+
+    def __len__(self) -> int:
+        return len(self._current().items)
+
+    # ── поиск ───────────────────────────────────────────────────────────
+    def exact(self, query: str):
+        snap = self._current()
+        i = snap.exact.get(normalize(query))
+        return None if i is None else snap.items[i]
+
+    def contains(self, query: str) -> list:
+        """Записи, где запрос — подстрока вопроса или категории (в порядке файла)."""
+        snap = self._current()
+        q = normalize(query)
+        return [
+            snap.items[i]
+            for i in snap.candidates(q)
+            if q in snap.questions[i] or q in snap.categories[i]
+        ]
+
+    def category(self, query: str) -> list:
+        """Все записи категории, если запрос — её название (в порядке файла)."""
+        snap = self._current()
+        q = normalize(query)
+        return [snap.items[i] for i in snap.candidates(q) if snap.categories[i] == q] if q else []
+
+    def search(self, query: str, k: int = KB_TOP_K, threshold: float = KB_SCORE_THRESHOLD) -> list:
+        """BM25: до k записей с оценкой не ниже threshold, как [(оценка, запись)]."""
+        snap = self._current()
+        return [(score, snap.items[i]) for score, i in snap.bm25.top(query, k) if score >= threshold]
+
+    def lookup(self, query: str) -> list:
+        """Сначала точное совпадение вопроса, иначе совпадения по подстроке."""
+        hit = self.exact(query)
+        if hit is not None:
+            return [hit]
+        return self.contains(query)
+
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_knowledge_base(path: str = KB_PATH) -> KnowledgeBase:
+    """Общий экземпляр на путь — индекс строится один раз на процесс."""
+    key = os.path.abspath(path)
+    with _instances_lock:
+        kb = _instances.get(key)
+        if kb is None:
+            kb = _instances[key] = KnowledgeBase(path)
+        return kb
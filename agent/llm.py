@@ -0,0 +1,56 @@
+"""
+Ленивая фабрика LLM: клиент Gemini создаётся при первом вызове get_llm(),
+а не при импорте, поэтому тесты и воркеры без ключа стартуют без него.
+
+llm_limit/llm_slot — лимит одновременных обращений к модели: вызывающий
+(AgentService) задаёт семафор на время хода, а маршрутизатор и ответчик
+занимают слот только на время самого вызова модели.
+"""
+
+import os
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+
+
+@lru_cache(maxsize=None)
+def get_llm(model: str = DEFAULT_MODEL, api_key: str = None):
+    """Один клиент на (модель, ключ) в процессе; без ключа — RuntimeError."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise RuntimeError("GOOGLE_API_KEY не найден! Проверь .env или переменные окружения.")
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(model=model, google_api_key=api_key)
+
+
+# ── лимит одновременных обращений ───────────────────────────────────────
+_slots = ContextVar("llm_slots", default=None)
+
+
+@contextmanager
+def llm_limit(semaphore):
+    """Асинхронные вызовы LLM в блоке (и в задачах, запущенных из него) занимают слот semaphore."""
+    previous = _slots.get()
+    _slots.set(semaphore)
+    try:
+        yield
+    finally:
+        _slots.set(previous)   # не reset(token): генератор могут закрыть из другого контекста
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Слот на один вызов модели; без llm_limit — без ограничения."""
+    semaphore = _slots.get()
+    if semaphore is None:
+        yield
+        return
+    async with semaphore:
+        yield
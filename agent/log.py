@@ -0,0 +1,19 @@
+"""
+Настройка логирования агента.
+
+Диагностика инструментов и маршрутизации пишется через logging на уровнях
+DEBUG/INFO, ошибки — WARNING/ERROR. По умолчанию LOG_LEVEL=WARNING: в
+продакшене на горячем пути ничего не печатается; LOG_LEVEL=INFO или DEBUG
+включает подробный вывод.
+"""
+
+import logging
+import os
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+
+def configure_logging(level: str = None) -> None:
+    """Вызывается точками входа (main.py, сервис); библиотечные модули только берут логгеры."""
+    logging.basicConfig(level=(level or LOG_LEVEL).upper(), format=LOG_FORMAT)
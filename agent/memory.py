@@ -1,16 +1,245 @@
+"""
+Векторная память агента: записи базы знаний и реплики диалогов.
+
+Хранилище подключаемое: Qdrant (боевой режим) или NumpyStore — косинусная
+близость в памяти процесса для тестов и офлайн-запусков. Клиент Qdrant
+создаётся лениво при первом обращении, импорт модуля ничего не подключает.
+"""
+
+import hashlib
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance
+import threading
+import uuid
+from functools import lru_cache
+
+import numpy as np
 
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY") or None
 COLLECTION = os.getenv("QDRANT_COLLECTION", "customer_support_memory")
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "qdrant" if QDRANT_URL else "numpy")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))
+VECTOR_SIZE = int(os.getenv("MEMORY_VECTOR_SIZE", "1536"))
+
+_ID_NAMESPACE = uuid.UUID("6f1f4d3c-3b0e-4c55-9a41-2f6a1c0de001")
+
+
+# ── клиент Qdrant ───────────────────────────────────────────────────────
+@lru_cache(maxsize=None)
+def get_client(url: str = QDRANT_URL, api_key: str = QDRANT_API_KEY):
+    """Один клиент (и пул HTTP-соединений) на адрес сервера в процессе."""
+    from qdrant_client import QdrantClient
+
+    return QdrantClient(url=url, api_key=api_key)
+
+
+def __getattr__(name):
+    # совместимость: раньше `client` создавался при импорте модуля
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def ensure_collection(vector_size: int = VECTOR_SIZE) -> None:
+    QdrantStore(vector_size=vector_size).ensure_collection()
+
+
+def point_id(key: str) -> str:
+    """Детерминированный UUID: повторная загрузка той же записи перезаписывает точку."""
+    return str(uuid.uuid5(_ID_NAMESPACE, key))
+
+
+# ── эмбеддинги ──────────────────────────────────────────────────────────
+class HashingEmbedder:
+    """Офлайн-эмбеддер: хешированный мешок стеммированных слов, без сети и моделей."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def embed_documents(self, texts: list) -> list:
+        from agent.knowledge_base import tokenize
+
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                h = int.from_bytes(hashlib.blake2b(term.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        return out.tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
+
+
+# ── хранилища ───────────────────────────────────────────────────────────
+class NumpyStore:
+    """Косинусная близость в памяти процесса; API совпадает с QdrantStore."""
+
+    def __init__(self, vector_size: int = VECTOR_SIZE):
+        self.vector_size = vector_size
+        self._vectors = np.zeros((0, vector_size), dtype=np.float32)
+        self._payloads = []
+        self._rows = {}  # id точки → строка матрицы
+        self._lock = threading.Lock()
+
+    def ensure_collection(self) -> None:
+        pass
 
-client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    def __len__(self) -> int:
+        return len(self._payloads)
 
-def ensure_collection(vector_size: int = 1536) -> None:
-    if COLLECTION not in [c.name for c in client.get_collections().collections]:
-        client.recreate_collection(
-            collection_name=COLLECTION,
-            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+    def upsert(self, ids: list, vectors: list, payloads: list) -> None:
+        vecs = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.vector_size)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs / np.where(norms == 0, 1, norms)
+        with self._lock:
+            n = len(self._payloads)
+            new = sum(1 for pid in dict.fromkeys(ids) if pid not in self._rows)
+            if n + new > len(self._vectors):  # растём удвоением, а не на каждую вставку
+                grown = np.zeros((max(2 * len(self._vectors), n + new, 64), self.vector_size), dtype=np.float32)
+                grown[:n] = self._vectors[:n]
+                self._vectors = grown
+            for pid, vec, payload in zip(ids, vecs, payloads):
+                row = self._rows.get(pid)
+                if row is None:
+                    row = self._rows[pid] = len(self._payloads)
+                    self._payloads.append(payload)
+                else:
+                    self._payloads[row] = payload
+                self._vectors[row] = vec
+
+    def search(self, vector: list, k: int = 5, filters: dict = None) -> list:
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            n = len(self._payloads)
+            scores = self._vectors[:n] @ q
+            payloads = self._payloads[:n]
+        if filters:
+            mask = np.fromiter(
+                (all(p.get(key) == value for key, value in filters.items()) for p in payloads),
+                dtype=bool, count=n,
+            )
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, n)
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), payloads[i]) for i in top if scores[i] != -np.inf]
+
+
+class QdrantStore:
+    def __init__(self, collection: str = COLLECTION, vector_size: int = VECTOR_SIZE, client=None):
+        self.collection = collection
+        self.vector_size = vector_size
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    def ensure_collection(self) -> None:
+        from qdrant_client.models import VectorParams, Distance
+
+        if self.collection not in [c.name for c in self.client.get_collections().collections]:
+            self.client.recreate_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE)
+            )
+
+    def upsert(self, ids: list, vectors: list, payloads: list) -> None:
+        from qdrant_client.models import Batch
+
+        self.client.upsert(
+            collection_name=self.collection,
+            points=Batch(ids=list(ids), vectors=[list(map(float, v)) for v in vectors], payloads=list(payloads)),
+        )
+
+    def search(self, vector: list, k: int = 5, filters: dict = None) -> list:
+        from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+        query_filter = None
+        if filters:
+            query_filter = Filter(must=[
+                FieldCondition(key=key, match=MatchValue(value=value)) for key, value in filters.items()
+            ])
+        hits = self.client.search(
+            collection_name=self.collection,
+            query_vector=list(map(float, vector)),
+            query_filter=query_filter,
+            limit=k,
         )
+        return [(hit.score, hit.payload) for hit in hits]
+
+
+def make_store(backend: str = MEMORY_BACKEND, vector_size: int = None):
+    vector_size = vector_size or VECTOR_SIZE
+    if backend == "numpy":
+        return NumpyStore(vector_size=vector_size)
+    if backend == "qdrant":
+        return QdrantStore(vector_size=vector_size)
+    raise ValueError(f"Неизвестный MEMORY_BACKEND: {backend}")
+
+
+# ── память ──────────────────────────────────────────────────────────────
+class VectorMemory:
+    """Пакетное индексирование и поиск по смыслу поверх эмбеддера и хранилища."""
+
+    def __init__(self, embedder, store=None, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 upsert_batch_size: int = UPSERT_BATCH_SIZE):
+        self.embedder = embedder
+        # размерность хранилища по умолчанию — как у эмбеддера (HashingEmbedder: 256, а не 1536)
+        self.store = store if store is not None else make_store(vector_size=getattr(embedder, "dim", None))
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.store.ensure_collection()
+
+    def add_texts(self, texts: list, payloads: list, keys: list) -> int:
+        """Эмбеддинг пачками по embed_batch_size, запись пачками по upsert_batch_size."""
+        pending_ids, pending_vecs, pending_payloads = [], [], []
+        for start in range(0, len(texts), self.embed_batch_size):
+            chunk = texts[start:start + self.embed_batch_size]
+            pending_vecs.extend(self.embedder.embed_documents(chunk))
+            for i in range(start, start + len(chunk)):
+                pending_ids.append(point_id(keys[i]))
+                pending_payloads.append({**payloads[i], "text": texts[i]})
+            while len(pending_ids) >= self.upsert_batch_size:
+                self._flush(pending_ids, pending_vecs, pending_payloads, self.upsert_batch_size)
+        if pending_ids:
+            self._flush(pending_ids, pending_vecs, pending_payloads, len(pending_ids))
+        return len(texts)
+
+    def _flush(self, ids: list, vecs: list, payloads: list, n: int) -> None:
+        self.store.upsert(ids[:n], vecs[:n], payloads[:n])
+        del ids[:n], vecs[:n], payloads[:n]
+
+    def index_knowledge_base(self, items: list) -> int:
+        return self.add_texts(
+            [f"{it['question']}\n{it['answer']}" for it in items],
+            [{"kind": "kb", "category": it.get("category"), "question": it["question"],
+              "answer": it["answer"]} for it in items],
+            [f"kb:{it.get('category')}:{it['question']}" for it in items],
+        )
+
+    def add_turns(self, session_id: str, turns: list, start_index: int = 0) -> int:
+        """turns — [{'role': ..., 'content': ...}] в формате истории сессии."""
+        return self.add_texts(
+            [t["content"] for t in turns],
+            [{"kind": "turn", "session": session_id, "role": t["role"], "turn": start_index + i}
+             for i, t in enumerate(turns)],
+            [f"turn:{session_id}:{start_index + i}" for i in range(len(turns))],
+        )
+
+    def search(self, query: str, k: int = 5, category: str = None, session_id: str = None,
+               kind: str = None) -> list:
+        filters = {}
+        if category is not None:
+            filters["category"] = category
+        if session_id is not None:
+            filters["session"] = session_id
+        if kind is not None:
+            filters["kind"] = kind
+        return self.store.search(self.embedder.embed_query(query), k=k, filters=filters or None)
@@ -0,0 +1,296 @@
+"""
+Метрики агента: счётчики и гистограммы задержек в памяти процесса.
+
+- `timed(name, **labels)` — декоратор (sync и async), `timer` — контекстный
+  менеджер: время вызова уходит в гистограмму `<name>_seconds`; так измеряются
+  все инструменты tools.registry и узлы графа planner/executor/responder;
+- `inc(name, value, **labels)` — счётчики: вызовы LLM и токены
+  (`record_llm`), попадания в кэш, маршруты;
+- гистограмма хранит кумулятивные бакеты для Prometheus и кольцевой буфер
+  последних METRICS_SAMPLES значений для p50/p95/p99;
+- экспорт: `prometheus()` — текстовый формат Prometheus, `snapshot()`/`dump_json()` —
+  JSON; `serve_metrics(port)` отдаёт /metrics и /metrics.json по HTTP.
+
+Запись метрики — одна блокировка и пара сложений; METRICS_ENABLED=0 отключает всё.
+"""
+
+import bisect
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_SAMPLES = int(os.getenv("METRICS_SAMPLES", "2048"))
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "agent")
+
+# границы бакетов задержки, секунды
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quantile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum", "samples", "_next")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)   # последний — +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []
+        self._next = 0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < METRICS_SAMPLES:
+            self.samples.append(value)
+        else:
+            self.samples[self._next] = value
+            self._next = (self._next + 1) % METRICS_SAMPLES
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        out = {"count": self.count, "sum": self.sum}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = _quantile(ordered, q)
+        return out
+
+
+class Metrics:
+    def __init__(self, prefix: str = METRICS_PREFIX, enabled: bool = METRICS_ENABLED):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._counters = {}     # имя → {метки → значение}
+        self._histograms = {}   # имя → {метки → _Histogram}
+        self._lock = threading.Lock()
+
+    # ── запись ──────────────────────────────────────────────────────────
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if self.enabled:
+            self._observe(name, _labels_key(labels), value)
+
+    def _observe(self, name: str, key: tuple, value: float) -> None:
+        with self._lock:
+            self._series(name, key).observe(value)
+
+    def _series(self, name: str, key: tuple) -> _Histogram:
+        """Гистограмма серии (вызывать под self._lock); объект живёт до конца процесса."""
+        series = self._histograms.get(name)
+        if series is None:
+            series = self._histograms[name] = {}
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = _Histogram()
+        return hist
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+    def timed(self, name: str, **labels):
+        """Декоратор: время каждого вызова в `<name>_seconds`, ошибки — в `<name>_errors`."""
+        # серия находится один раз, дальше на вызов — только блокировка и запись замера
+        hist_name, errors_name, key = f"{name}_seconds", f"{name}_errors", _labels_key(labels)
+        clock, lock, hist = time.perf_counter, self._lock, None
+
+        def record(elapsed: float) -> None:
+            nonlocal hist
+            with lock:
+                if hist is None:
+                    hist = self._series(hist_name, key)
+                hist.observe(elapsed)
+
+        def wrap(fn):
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await fn(*args, **kwargs)
+                    start = clock()
+                    try:
+                        return await fn(*args, **kwargs)
+                    except BaseException:
+                        self.inc(errors_name, **labels)
+                        raise
+                    finally:
+                        record(clock() - start)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = clock()
+                try:
+                    return fn(*args, **kwargs)
+                except BaseException:
+                    self.inc(errors_name, **labels)
+                    raise
+                finally:
+                    record(clock() - start)
+            return wrapper
+        return wrap
+
+    # ── чтение и экспорт ────────────────────────────────────────────────
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_labels_key(labels), 0)
+
+    def histogram(self, name: str, **labels) -> dict:
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(_labels_key(labels))
+            return hist.summary() if hist else {"count": 0, "sum": 0.0}
+
+    def snapshot(self) -> dict:
+        """JSON-совместимый срез: счётчики и сводки гистограмм (count, sum, p50/p95/p99)."""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                    for name, series in sorted(self._counters.items())
+                },
+                "histograms": {
+                    name: [{"labels": dict(k), **h.summary()} for k, h in series.items()]
+                    for name, series in sorted(self._histograms.items())
+                },
+            }
+
+    def dump_json(self, path: str) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus: счётчики, бакеты и квантили гистограмм."""
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.extend(f"{metric}{fmt(k)} {v:g}" for k, v in series.items())
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for k, h in series.items():
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS + (float("inf"),), h.buckets):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{metric}_bucket{fmt(k, [('le', le)])} {cumulative}")
+                    lines.append(f"{metric}_sum{fmt(k)} {h.sum:.6f}")
+                    lines.append(f"{metric}_count{fmt(k)} {h.count}")
+                # p50/p95/p99 по последним замерам — отдельной метрикой типа summary
+                lines.append(f"# TYPE {metric}_recent summary")
+                for k, h in series.items():
+                    ordered = sorted(h.samples)
+                    for q in QUANTILES:
+                        lines.append(f"{metric}_recent{fmt(k, [('quantile', f'{q:g}')])} {_quantile(ordered, q):.6f}")
+                    lines.append(f"{metric}_recent_sum{fmt(k)} {sum(ordered):.6f}")
+                    lines.append(f"{metric}_recent_count{fmt(k)} {len(ordered)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            for series in self._histograms.values():
+                for hist in series.values():
+                    hist.__init__()   # объекты остаются: на них ссылаются обёртки timed
+
+
+metrics = Metrics()
+
+inc = metrics.inc
+observe = metrics.observe
+timer = metrics.timer
+timed = metrics.timed
+
+
+# ── LLM ─────────────────────────────────────────────────────────────────
+def record_llm(component: str, message=None) -> None:
+    """Вызов LLM и его токены: usage_metadata модели, иначе оценка по длине ответа."""
+    inc("llm_calls", component=component)
+    if message is None:
+        return
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        inc("llm_tokens", usage.get("input_tokens", 0), component=component, kind="input")
+        inc("llm_tokens", usage.get("output_tokens", 0), component=component, kind="output")
+    else:
+        from agent.history import estimate_tokens
+        inc("llm_tokens", estimate_tokens(str(getattr(message, "content", message))),
+            component=component, kind="output_estimated")
+
+
+def llm_callback_handler(component: str = "agent"):
+    """Обработчик колбэков LangChain для AgentExecutor: считает вызовы и токены модели."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _LLMMetrics(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            generations = [g for batch in response.generations for g in batch]
+            if not generations:
+                record_llm(component)
+            for g in generations:
+                record_llm(component, getattr(g, "message", None) or g.text)
+
+    return _LLMMetrics()
+
+
+# ── HTTP-экспорт ────────────────────────────────────────────────────────
+def serve_metrics(port: int, host: str = "127.0.0.1", registry: Metrics = metrics):
+    """Фоновый HTTP-сервер: /metrics (Prometheus) и /metrics.json. Возвращает сервер."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = registry.prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, ctype = json.dumps(registry.snapshot(), ensure_ascii=False).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
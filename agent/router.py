@@ -0,0 +1,208 @@
+"""
+Маршрутизатор планировщика: выбирает инструмент из tools.registry без LLM,
+когда намерение распознаётся дёшево.
+
+Порядок стадий:
+1. правила — скомпилированные регулярные выражения для частых намерений
+   (статус заказа, сброс пароля);
+2. уверенность базы знаний — BM25-оценка лучшего ответа FAQ;
+3. LLM — только если обе стадии не уверены (и модель передана);
+4. инструмент по умолчанию.
+
+`Router.stats()` показывает, какая доля ходов обслужена без обращения к LLM.
+"""
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+from agent.llm import llm_slot
+from agent.metrics import inc, record_llm
+from tools import registry
+
+ROUTER_KB_CONFIDENCE = float(os.getenv("ROUTER_KB_CONFIDENCE", "0.5"))
+ROUTER_DEFAULT_TOOL = os.getenv("ROUTER_DEFAULT_TOOL", "say_hello")
+
+_ORDER_NUMBER_RE = re.compile(r"(?:№|#|номер\w*)\s*(\d{3,})|\b(\d{5,})\b")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+@dataclass(frozen=True)
+class Route:
+    tool: str
+    args: Union[str, dict]
+    source: str          # rule | kb | llm | default
+    confidence: float = 1.0
+    intent: str = ""
+
+
+@dataclass(frozen=True)
+class IntentRule:
+    """Намерение: регулярное выражение + сборка аргументов инструмента.
+
+    build_args возвращает None, если в сообщении не хватает данных
+    (например, нет номера заказа) — тогда решает следующая стадия.
+    """
+    name: str
+    pattern: re.Pattern
+    tool: str
+    build_args: Callable[[re.Match, str], Optional[Union[str, dict]]]
+
+    def match(self, text: str):
+        m = self.pattern.search(text)
+        return None if m is None else self.build_args(m, text)
+
+
+def _order_status_args(match, text: str):
+    number = _ORDER_NUMBER_RE.search(text)
+    if number is None:
+        return None
+    return {"action_type": "проверить статус заказа", "details": number.group(1) or number.group(2)}
+
+
+def _password_reset_args(match, text: str):
+    email = _EMAIL_RE.search(text)
+    if email is None:
+        return None
+    return {"action_type": "сброс пароля", "details": email.group(0)}
+
+
+DEFAULT_RULES = (
+    IntentRule(
+        "order_status",
+        re.compile(r"(статус\w*|отслед\w*|провер\w*|где)\W+(?:\w+\W+){0,3}заказ|заказ\w*\s*(?:№|#|номер)", re.I),
+        "perform_website_action",
+        _order_status_args,
+    ),
+    IntentRule(
+        "password_reset",
+        re.compile(r"(сбро\w*|забыл\w*|восстанов\w*|смен\w*|помен\w*|не помню)\W+(?:\w+\W+){0,3}парол"
+                   r"|парол\w*\W+(?:\w+\W+){0,3}(сбро\w*|восстанов\w*|не подходит)", re.I),
+        "perform_website_action",
+        _password_reset_args,
+    ),
+)
+
+ROUTER_PROMPT = (
+    "Выбери один инструмент для ответа клиенту службы поддержки. Доступные инструменты:\n{tools}\n\n"
+    'Ответь только JSON: {{"tool": "<имя>", "args": "<строка>" или {{"<параметр>": "<значение>"}}}}. '
+    "Если нужно несколько независимых инструментов, верни JSON-массив таких объектов."
+)
+
+
+class Router:
+    def __init__(self, rules=DEFAULT_RULES, kb=None, llm=None,
+                 kb_confidence: float = ROUTER_KB_CONFIDENCE, default_tool: str = ROUTER_DEFAULT_TOOL):
+        self.rules = rules
+        self._kb = kb
+        self.llm = llm
+        self.kb_confidence = kb_confidence
+        self.default_tool = default_tool
+        self._stats = {"rule": 0, "kb": 0, "llm": 0, "default": 0}
+        self._llm_calls = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def kb(self):
+        if self._kb is None:
+            from agent.knowledge_base import get_knowledge_base
+            self._kb = get_knowledge_base()
+        return self._kb
+
+    # ── стадии без LLM ──────────────────────────────────────────────────
+    def _fast_routes(self, text: str) -> list:
+        """Все сработавшие правила плюс FAQ, если база уверена, — инструменты выполнятся параллельно."""
+        routes = []
+        for rule in self.rules:
+            if rule.tool not in registry:
+                continue
+            args = rule.match(text)
+            if args is not None:
+                routes.append(Route(rule.tool, args, "rule", 1.0, rule.name))
+
+        if "get_from_knowledge_base" in registry:
+            try:
+                if self.kb.exact(text) is not None:
+                    return routes + [Route("get_from_knowledge_base", text, "kb", 1.0, "faq")]
+                ranked = self.kb.search(text, k=1, threshold=0.0)
+            except (FileNotFoundError, ValueError):
+                ranked = []
+            if ranked and ranked[0][0] >= self.kb_confidence:
+                routes.append(Route("get_from_knowledge_base", text, "kb", ranked[0][0], "faq"))
+        return routes
+
+    # ── LLM ─────────────────────────────────────────────────────────────
+    def _llm_messages(self, text: str) -> list:
+        described = (registry.describe(name) for name in sorted(registry))
+        tools = "\n".join(f"- {d['name']}{d['signature']}: {d['doc']}" for d in described)
+        return [("system", ROUTER_PROMPT.format(tools=tools)), ("human", text)]
+
+    def _parse_llm(self, content: str, text: str) -> list:
+        match = re.search(r"[\[{].*[\]}]", str(content), re.S)
+        try:
+            choice = json.loads(match.group(0)) if match else None
+        except json.JSONDecodeError:
+            choice = None
+        choices = choice if isinstance(choice, list) else [choice]
+        return [
+            Route(c["tool"], c.get("args") or text, "llm", 0.0, "llm")
+            for c in choices
+            if isinstance(c, dict) and c.get("tool") in registry
+        ]
+
+    def _count_llm_call(self) -> None:
+        with self._stats_lock:
+            self._llm_calls += 1
+
+    def _default(self, text: str) -> list:
+        return [Route(self.default_tool, text, "default", 0.0)]
+
+    def _record(self, routes: list) -> list:
+        with self._stats_lock:
+            self._stats[routes[0].source] += 1
+        inc("routes", source=routes[0].source)
+        return routes
+
+    # ── API ─────────────────────────────────────────────────────────────
+    def plan(self, text: str) -> list:
+        """Список вызовов инструментов для сообщения (не пустой)."""
+        routes = self._fast_routes(text)
+        if not routes and self.llm is not None:
+            self._count_llm_call()
+            reply = self.llm.invoke(self._llm_messages(text))
+            record_llm("router", reply)
+            routes = self._parse_llm(reply.content, text)
+        return self._record(routes or self._default(text))
+
+    async def aplan(self, text: str) -> list:
+        routes = self._fast_routes(text)
+        if not routes and self.llm is not None:
+            self._count_llm_call()
+            async with llm_slot():
+                reply = await self.llm.ainvoke(self._llm_messages(text))
+            record_llm("router", reply)
+            routes = self._parse_llm(reply.content, text)
+        return self._record(routes or self._default(text))
+
+    def route(self, text: str) -> Route:
+        return self.plan(text)[0]
+
+    async def aroute(self, text: str) -> Route:
+        return (await self.aplan(text))[0]
+
+    def stats(self) -> dict:
+        """Счётчики по стадиям, число вызовов LLM и доля ходов, решённых без LLM (rule + kb).
+
+        Маршрут default тоже считается ходом с LLM: дальше его обрабатывает
+        модель (ответчик графа или агент в main.py).
+        """
+        with self._stats_lock:
+            counts = dict(self._stats)
+            counts["llm_calls"] = self._llm_calls
+        total = counts["rule"] + counts["kb"] + counts["llm"] + counts["default"]
+        counts["total"] = total
+        counts["without_llm_ratio"] = ((counts["rule"] + counts["kb"]) / total) if total else 0.0
+        return counts
@@ -0,0 +1,171 @@
+"""
+Асинхронный режим обслуживания: много сессий одновременно поверх build_graph().
+
+- запросы одной сессии выполняются строго по очереди (asyncio.Lock на сессию),
+  разные сессии — параллельно;
+- число одновременных обращений к LLM ограничено семафором (agent.llm.llm_limit):
+  слот занимают только сами вызовы модели — маршрутизатора и ответчика, — а
+  не весь прогон графа, так что инструменты (поиск — до 30 с) слотов не держат;
+- при переполнении очереди новые запросы сразу отклоняются (ServiceOverloaded),
+  а не копятся в памяти.
+
+Запуск сервера (JSON Lines по TCP: {"session_id": ..., "message": ...} → {"response": ...}):
+    python -m agent.service --port 8765
+
+С "stream": true в запросе сервер шлёт события хода по мере появления —
+строки {"event": {...}} (токены, статусы инструментов, см. agent.streaming),
+последняя из них — событие done с полным ответом.
+
+--metrics-port (METRICS_PORT) поднимает HTTP-эндпоинт метрик: /metrics в
+формате Prometheus и /metrics.json (см. agent.metrics).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from agent.llm import llm_limit
+from agent.metrics import inc, observe, timer
+from agent.streaming import astream_graph
+
+MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "16"))
+MAX_PENDING = int(os.getenv("SERVICE_MAX_PENDING", "256"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+
+class ServiceOverloaded(RuntimeError):
+    pass
+
+
+class AgentService:
+    def __init__(self, graph=None, *, max_concurrency: int = MAX_CONCURRENCY,
+                 max_pending: int = MAX_PENDING, store=None):
+        if graph is None:
+            from agent.graph_builder import build_graph
+            graph = build_graph()
+        self.graph = graph
+        self.store = store
+        self.max_pending = max_pending
+        self._llm_slots = asyncio.Semaphore(max_concurrency)
+        self._session_locks = {}  # session_id → [lock, число ожидающих]
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @asynccontextmanager
+    async def _turn(self, session_id: str):
+        """Очередь сессии + контроль переполнения вокруг одного хода."""
+        if self._pending >= self.max_pending:
+            inc("service_rejected")
+            raise ServiceOverloaded(f"Очередь переполнена ({self._pending} запросов)")
+        self._pending += 1
+        entry = self._session_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            self._pending -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._session_locks.pop(session_id, None)
+
+    async def _save(self, session_id: str, message: str, response: str) -> None:
+        if self.store is not None:
+            await asyncio.to_thread(self.store.append_turn, session_id, message, response)
+
+    async def handle(self, session_id: str, message: str) -> str:
+        async with self._turn(session_id):
+            with llm_limit(self._llm_slots), timer("service_turn", mode="invoke"):
+                result = await self.graph.ainvoke({"user_input": message, "session_id": session_id})
+            response = result["response"]
+            await self._save(session_id, message, response)
+            return response
+
+    async def stream(self, session_id: str, message: str):
+        """Как handle, но отдаёт события хода по мере появления; последнее — done."""
+        async with self._turn(session_id):
+            with llm_limit(self._llm_slots):
+                start, first_token = time.perf_counter(), True
+                async for event in astream_graph(self.graph, {"user_input": message, "session_id": session_id}):
+                    if event["type"] == "done":
+                        done = event
+                        continue
+                    if first_token and event["type"] == "token":
+                        first_token = False
+                        observe("service_ttft_seconds", time.perf_counter() - start)
+                    yield event
+                observe("service_turn_seconds", time.perf_counter() - start, mode="stream")
+            await self._save(session_id, message, done["response"])
+            yield done
+
+
+# ── TCP-сервер JSON Lines ───────────────────────────────────────────────
+async def _serve_client(service: AgentService, reader, writer) -> None:
+    async def send(request: dict, reply: dict) -> None:
+        if "id" in request:
+            reply["id"] = request["id"]
+        writer.write(json.dumps(reply, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+
+    async def answer(request: dict) -> None:
+        session_id, message = str(request["session_id"]), request["message"]
+        try:
+            if request.get("stream"):
+                async for event in service.stream(session_id, message):
+                    await send(request, {"event": event})
+                return
+            reply = {"response": await service.handle(session_id, message)}
+        except ServiceOverloaded as e:
+            reply = {"error": "overloaded", "detail": str(e)}
+        except Exception as e:
+            reply = {"error": "internal", "detail": str(e)}
+        await send(request, reply)
+
+    tasks = set()
+    try:
+        while line := await reader.readline():
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            task = asyncio.create_task(answer(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, **service_kwargs) -> None:
+    from agent.session_store import SessionStore
+
+    service = AgentService(store=SessionStore(), **service_kwargs)
+    server = await asyncio.start_server(lambda r, w: _serve_client(service, r, w), host, port)
+    print(f"Сервис агента слушает {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Асинхронный сервис агента поддержки")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="порт HTTP с /metrics (Prometheus) и /metrics.json; 0 — выключено")
+    args = parser.parse_args()
+
+    from agent.log import configure_logging
+    from agent.metrics import serve_metrics
+
+    configure_logging()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, args.host)
+    asyncio.run(serve(args.host, args.port, max_concurrency=args.max_concurrency, max_pending=args.max_pending))
@@ -0,0 +1,248 @@
+"""
+Хранилище истории сессий: append-only JSONL, одна реплика на строку.
+
+Ход диалога дописывается одним вызовом write в файл, открытый с O_APPEND,
+поэтому стоимость сохранения не зависит от длины переписки. Если процесс упал
+посреди записи, недописанная последняя строка просто пропускается при чтении
+и удаляется при ближайшем сжатии (compaction) в фоне. Сжатие также выбрасывает
+реплики, уже свёрнутые в резюме (agent.history), и не переписывает файл, если
+выбрасывать нечего.
+
+Старые файлы `sessions/<id>.json` (весь список одним JSON) переводятся в новый
+формат при первом обращении к сессии или командой
+`python -m agent.session_store migrate`.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+SESSION_DIR = os.getenv("SESSION_DIR", "sessions")
+SESSION_FSYNC = os.getenv("SESSION_FSYNC", "0") == "1"
+COMPACT_EVERY = int(os.getenv("SESSION_COMPACT_EVERY", "200"))  # дозаписей между сжатиями
+
+_TAIL_BLOCK = 64 * 1024
+
+
+class SessionStore:
+    def __init__(self, directory: str = SESSION_DIR, fsync: bool = SESSION_FSYNC,
+                 compact_every: int = COMPACT_EVERY):
+        self.directory = directory
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._appends = {}
+        self._tail_checked = set()
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-compact")
+
+    # ── пути и блокировки ───────────────────────────────────────────────
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def legacy_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    # ── запись ──────────────────────────────────────────────────────────
+    def append(self, session_id: str, *records: dict) -> None:
+        """Дописывает записи одной операцией write (ход = реплика пользователя + ответ)."""
+        data = b"".join(orjson.dumps(r) + b"\n" for r in records)
+        with self._lock(session_id):
+            self._migrate_locked(session_id)
+            os.makedirs(self.directory, exist_ok=True)
+            fd = os.open(self.path(session_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if session_id not in self._tail_checked:
+                    # после падения файл может кончаться недописанной строкой —
+                    # начинаем с новой строки, чтобы не склеить с ней новую запись
+                    if not _ends_with_newline(self.path(session_id)):
+                        data = b"\n" + data
+                    self._tail_checked.add(session_id)
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            count = self._appends[session_id] = self._appends.get(session_id, 0) + 1
+        if self.compact_every and count % self.compact_every == 0:
+            self.compact_in_background(session_id)
+
+    def append_turn(self, session_id: str, user_input: str, output: str) -> None:
+        self.append(session_id, {"role": "user", "content": user_input}, {"role": "ai", "content": output})
+
+    # ── чтение ──────────────────────────────────────────────────────────
+    def load(self, session_id: str) -> list:
+        """Вся история сессии (битые строки пропускаются)."""
+        with self._lock(session_id):
+            self._migrate_locked(session_id)
+        try:
+            with open(self.path(session_id), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        return _decode_lines(_complete_lines(data))
+
+    def load_recent(self, session_id: str, limit: int) -> list:
+        """Последние `limit` записей: файл читается с конца блоками, не целиком."""
+        if limit <= 0:
+            return []
+        with self._lock(session_id):
+            self._migrate_locked(session_id)
+        try:
+            f = open(self.path(session_id), "rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            pos, buf = end, b""
+            while pos > 0:
+                step = min(_TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                # +2: недописанный хвост и строка, обрезанная началом блока
+                if buf.count(b"\n") >= limit + 2:
+                    break
+        lines = _complete_lines(buf)
+        if pos > 0:
+            lines = lines[1:]  # первая строка блока может быть неполной
+        return _decode_lines(lines)[-limit:]
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self.path(session_id)) or os.path.exists(self.legacy_path(session_id))
+
+    # ── сжатие ──────────────────────────────────────────────────────────
+    def compact(self, session_id: str) -> bool:
+        """Переписывает файл, только если есть что выбросить: битые строки, устаревшие
+        резюме и реплики, уже свёрнутые в последнее резюме (кроме его `keep`).
+
+        Чтение и запись temp-файла идут без блокировки сессии, так что дозапись
+        хода не ждёт сжатия; под блокировкой к temp-файлу дописывается то, что
+        успели добавить за это время, и делается атомарный os.replace.
+        Возвращает True, если файл переписан.
+        """
+        path = self.path(session_id)
+        try:
+            with open(path, "rb") as f:
+                ino = os.fstat(f.fileno()).st_ino
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        consumed = data.rfind(b"\n") + 1   # хвост без перевода строки может дописываться прямо сейчас
+        lines = _complete_lines(data[:consumed])
+        records = _decode_lines(lines)
+        kept = _compacted(records)
+        if len(kept) == len(lines):
+            return False   # битых строк нет и выбрасывать нечего — файл не трогаем
+
+        tmp = f"{path}.compact-{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as out:
+            out.write(b"".join(orjson.dumps(r) + b"\n" for r in kept))
+            with self._lock(session_id):
+                try:
+                    with open(path, "rb") as f:
+                        if os.fstat(f.fileno()).st_ino != ino:
+                            raise FileNotFoundError(path)   # файл уже заменили — сжатие устарело
+                        f.seek(consumed)
+                        out.write(f.read())                 # дозаписанное за время сжатия
+                except FileNotFoundError:
+                    os.remove(tmp)
+                    return False
+                out.flush()
+                os.fsync(out.fileno())
+                os.replace(tmp, path)
+                self._tail_checked.discard(session_id)   # хвост мог быть недописан — проверить при дозаписи
+        return True
+
+    def compact_in_background(self, session_id: str):
+        return self._compactor.submit(self.compact, session_id)
+
+    def close(self) -> None:
+        """Дожидается фоновых сжатий (вызывать при завершении процесса)."""
+        self._compactor.shutdown(wait=True)
+
+    # ── миграция старого формата ────────────────────────────────────────
+    def migrate(self, session_id: str) -> bool:
+        with self._lock(session_id):
+            return self._migrate_locked(session_id)
+
+    def migrate_all(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-len(".json")] for name in sorted(os.listdir(self.directory)) if name.endswith(".json")]
+        return [sid for sid in ids if self.migrate(sid)]
+
+    def _migrate_locked(self, session_id: str) -> bool:
+        legacy = self.legacy_path(session_id)
+        if not os.path.exists(legacy) or os.path.exists(self.path(session_id)):
+            return False
+        try:
+            with open(legacy, "rb") as f:
+                records = orjson.loads(f.read())
+            if not isinstance(records, list):
+                records = []
+        except orjson.JSONDecodeError:
+            records = []  # как и раньше: нечитаемая история — начинаем заново
+        self._write_atomic(self.path(session_id), records)
+        os.replace(legacy, legacy + ".bak")
+        return True
+
+    def _write_atomic(self, path: str, records: list) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(orjson.dumps(r) + b"\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+def _compacted(records: list) -> list:
+    """Последнее резюме, `keep` реплик перед ним (окно на момент сворачивания) и всё после."""
+    last = max((i for i, r in enumerate(records) if r.get("type") == "summary"), default=None)
+    if last is None:
+        return records
+    keep = records[last].get("keep", 0)
+    before = [r for r in records[:last] if r.get("type") != "summary"]
+    return (before[-keep:] if keep else []) + records[last:last + 1] + \
+        [r for r in records[last + 1:] if r.get("type") != "summary"]
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return True
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+
+def _complete_lines(data: bytes) -> list:
+    """Строки, завершённые переводом строки; недописанный хвост отбрасывается."""
+    return data.split(b"\n")[:-1]
+
+
+def _decode_lines(lines: list) -> list:
+    out = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            out.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            continue
+    return out
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrated = SessionStore().migrate_all()
+        print(f"Переведено сессий: {len(migrated)} {migrated}")
+    else:
+        print("Использование: python -m agent.session_store migrate")
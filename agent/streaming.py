@@ -0,0 +1,101 @@
+"""
+Потоковая выдача ответа: события хода доходят до канала по мере появления.
+
+Единый формат событий (dict) для графа и для AgentExecutor из main.py:
+    {"type": "plan", "tools": [...], "source": ...}   — выбраны инструменты;
+    {"type": "tool_start", "tool": ...}               — инструмент запущен;
+    {"type": "tool_end", "tool": ..., "output": ...}  — инструмент ответил;
+    {"type": "token", "content": ...}                 — очередной фрагмент ответа;
+    {"type": "done", "response": ...}                 — ход завершён, полный ответ.
+
+Узлы графа пишут события через `emit` (custom stream mode LangGraph); вне
+потокового прогона `emit` ничего не делает, поэтому invoke/ainvoke не меняются.
+"""
+
+import sys
+
+
+def emit(event: dict) -> None:
+    """Отправляет событие в поток графа, если ход идёт через stream/astream."""
+    from langgraph.config import get_stream_writer
+
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return  # узел вызван напрямую, вне графа
+    writer(event)
+
+
+def chunk_text(chunk) -> str:
+    """Текст фрагмента модели: content бывает строкой или списком частей (Gemini)."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return ""
+
+
+# ── граф ────────────────────────────────────────────────────────────────
+def stream_graph(graph, inputs: dict):
+    """События хода скомпилированного графа (синхронно); последнее — done."""
+    final = {}
+    for mode, chunk in graph.stream(inputs, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            final = chunk
+    yield {"type": "done", "response": final.get("response", "")}
+
+
+async def astream_graph(graph, inputs: dict):
+    """Асинхронный вариант stream_graph."""
+    final = {}
+    async for mode, chunk in graph.astream(inputs, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            final = chunk
+    yield {"type": "done", "response": final.get("response", "")}
+
+
+# ── AgentExecutor ───────────────────────────────────────────────────────
+async def astream_agent(agent_executor, inputs: dict, config: dict = None):
+    """astream_events AgentExecutor → события того же формата.
+
+    В done дополнительно лежит полный результат исполнителя (`result`),
+    например с intermediate_steps. config — конфиг запуска (колбэки и т.п.).
+    """
+    result = {}
+    async for event in agent_executor.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            text = chunk_text(event["data"]["chunk"])
+            if text:
+                yield {"type": "token", "content": text}
+        elif kind == "on_tool_start":
+            yield {"type": "tool_start", "tool": event["name"]}
+        elif kind == "on_tool_end":
+            yield {"type": "tool_end", "tool": event["name"], "output": str(event["data"].get("output", ""))}
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            result = event["data"].get("output") or {}
+    yield {"type": "done", "response": result.get("output", ""), "result": result}
+
+
+# ── вывод в консоль ─────────────────────────────────────────────────────
+def print_event(event: dict, out=sys.stdout) -> None:
+    """Токены печатаются без перевода строки, статусы инструментов — отдельными строками."""
+    kind = event["type"]
+    if kind == "token":
+        out.write(event["content"])
+    elif kind == "tool_start":
+        out.write(f"\n--- Инструмент {event['tool']} запущен ---\n")
+    elif kind == "tool_end":
+        out.write(f"--- Инструмент {event['tool']} ответил ---\n")
+    elif kind == "done":
+        out.write("\n")
+    out.flush()
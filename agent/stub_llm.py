@@ -0,0 +1,80 @@
+"""
+Заглушка чат-модели для тестов, нагрузочных прогонов и пакетной обработки без сети.
+
+Повторяет нужную графу часть интерфейса LangChain-моделей (`invoke`/`ainvoke`,
+`stream`/`astream`) и имитирует задержку: `latency` — до первого токена,
+`token_latency` — между токенами потока, `prompt_token_latency` — на каждое
+слово промпта (prefill: чем длиннее история, тем позже первый токен).
+"""
+
+import asyncio
+import re
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class StubLLM:
+    def __init__(self, latency: float = 0.0, reply=None, token_latency: float = 0.0,
+                 prompt_token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.reply = reply or (lambda messages: f"Ответ: {_last_text(messages)}")
+        self.calls = 0
+
+    def _tokens(self, messages) -> list:
+        return re.findall(r"\s*\S+\s*|\s+", self.reply(messages)) or [""]
+
+    def _first_token_delay(self, messages) -> float:
+        if not self.prompt_token_latency:
+            return self.latency
+        return self.latency + self.prompt_token_latency * len(_prompt_text(messages).split())
+
+    def invoke(self, messages, *args, **kwargs) -> AIMessage:
+        self.calls += 1
+        tokens = self._tokens(messages)
+        delay = self._first_token_delay(messages) + self.token_latency * (len(tokens) - 1)
+        if delay:
+            time.sleep(delay)
+        return AIMessage(content="".join(tokens))
+
+    async def ainvoke(self, messages, *args, **kwargs) -> AIMessage:
+        self.calls += 1
+        tokens = self._tokens(messages)
+        delay = self._first_token_delay(messages) + self.token_latency * (len(tokens) - 1)
+        if delay:
+            await asyncio.sleep(delay)
+        return AIMessage(content="".join(tokens))
+
+    def stream(self, messages, *args, **kwargs):
+        self.calls += 1
+        for i, token in enumerate(self._tokens(messages)):
+            delay = self._first_token_delay(messages) if i == 0 else self.token_latency
+            if delay:
+                time.sleep(delay)
+            yield AIMessageChunk(content=token)
+
+    async def astream(self, messages, *args, **kwargs):
+        self.calls += 1
+        for i, token in enumerate(self._tokens(messages)):
+            delay = self._first_token_delay(messages) if i == 0 else self.token_latency
+            if delay:
+                await asyncio.sleep(delay)
+            yield AIMessageChunk(content=token)
+
+
+def _last_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    last = messages[-1]
+    return last[1] if isinstance(last, tuple) else getattr(last, "content", str(last))
+
+
+def _prompt_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return " ".join(
+        m[1] if isinstance(m, tuple) else m.get("content", "") if isinstance(m, dict) else getattr(m, "content", str(m))
+        for m in messages
+    )
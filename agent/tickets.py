@@ -0,0 +1,378 @@
+"""
+Хранилище тикетов поддержки: SQLite через SQLAlchemy.
+
+- id — полный uuid4 (36 символов), без коллизий усечённых 8-символьных id;
+- индексы (email, status, created_at), (session_id, created_at),
+  (status, created_at) и created_at — запросы «открытые тикеты пользователя»
+  и «похожие недавние обращения» не сканируют таблицу;
+- запись не блокирует ход агента: create()/set_status() кладут операцию в
+  очередь и дописывают её в журнал, а фоновый поток пишет очередь в базу
+  пачками в одной транзакции. Когда всё записано в базу, журнал обнуляется;
+- журнал у каждого хранилища свой — `<db>.pending-<pid>-<метка>.jsonl` (JSONL,
+  O_APPEND), владелец держит на нём flock. При открытии доигрываются и
+  удаляются журналы, которые никто не держит, — оставшиеся после падения
+  процессов; журналы работающих процессов (сервис и пакетный прогон на одной
+  базе) не трогаются;
+- чтения видят ещё не записанные тикеты (они лежат в памяти до сброса пачки).
+
+Похожесть обращений — доля общих стемов (Jaccard) описаний после
+нормализации, как в поиске по базе знаний. Сравниваются только обращения того
+же клиента (email, без него — session_id): чужие тикеты никогда не попадают в
+ответ.
+"""
+
+import atexit
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+
+from agent.knowledge_base import tokenize
+from agent.metrics import inc, observe
+
+log = logging.getLogger(__name__)
+
+TICKET_DB_PATH = os.getenv("TICKET_DB_PATH", "tickets.db")
+TICKET_BATCH_SIZE = int(os.getenv("TICKET_BATCH_SIZE", "1000"))
+TICKET_FLUSH_INTERVAL = float(os.getenv("TICKET_FLUSH_INTERVAL", "0.05"))   # с, максимум ожидания пачки
+TICKET_JOURNAL = os.getenv("TICKET_JOURNAL", "1") == "1"
+TICKET_DEDUPE_WINDOW = float(os.getenv("TICKET_DEDUPE_WINDOW", str(24 * 3600)))
+TICKET_DEDUPE_THRESHOLD = float(os.getenv("TICKET_DEDUPE_THRESHOLD", "0.8"))
+
+OPEN_STATUSES = ("open", "in_progress")
+STATUSES = OPEN_STATUSES + ("closed",)
+
+_STOP = object()
+_FLUSH = object()   # «записать накопленное сейчас, не дожидаясь пачки»
+
+
+def terms_of(text: str) -> list:
+    """Отсортированные уникальные стемы описания — основа сравнения обращений."""
+    return sorted(set(tokenize(text)))
+
+
+def similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def format_ticket(t: dict) -> str:
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(t["created_at"]))
+    return f"№{t['id']} [{t['status']}, {created}]: {t['description']}"
+
+
+class TicketStore:
+    def __init__(self, path: str = TICKET_DB_PATH, *, batch_size: int = TICKET_BATCH_SIZE,
+                 flush_interval: float = TICKET_FLUSH_INTERVAL, journal: bool = TICKET_JOURNAL):
+        from sqlalchemy import Column, Float, Index, MetaData, String, Table, Text, create_engine, event
+
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal_path = f"{path}.pending-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl" if journal else None
+        self.engine = create_engine(f"sqlite:///{path}")
+
+        @event.listens_for(self.engine, "connect")
+        def _pragmas(dbapi_conn, _):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")     # чтения не ждут пишущий поток
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.close()
+
+        metadata = MetaData()
+        self.table = Table(
+            "tickets", metadata,
+            Column("id", String(36), primary_key=True),
+            Column("email", String),
+            Column("status", String, nullable=False),
+            Column("created_at", Float, nullable=False),
+            Column("updated_at", Float, nullable=False),
+            Column("description", Text, nullable=False),
+            Column("terms", Text, nullable=False),
+            Column("session_id", String),
+            Index("ix_tickets_email_status_created", "email", "status", "created_at"),
+            Index("ix_tickets_session_created", "session_id", "created_at"),
+            Index("ix_tickets_status_created", "status", "created_at"),
+            Index("ix_tickets_created", "created_at"),
+        )
+        metadata.create_all(self.engine)
+
+        self._queue = queue.Queue()
+        self._pending = {}          # id → тикет, ещё не записанный в базу
+        self._pending_status = {}   # id → (статус, время) для записанных тикетов
+        self._lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._keep_journal = False      # была ошибка записи — журнал нужен для доигрывания
+        self._journal_fd = None
+        if journal:
+            self._replay_journals()
+            self._journal_fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            _try_lock(self._journal_fd)
+        self._writer = threading.Thread(target=self._run_writer, daemon=True, name="ticket-writer")
+        self._writer.start()
+
+    # ── журнал ──────────────────────────────────────────────────────────
+    def _journal_append(self, op: dict) -> None:
+        if self._journal_fd is not None:
+            os.write(self._journal_fd, orjson.dumps(op) + b"\n")   # O_APPEND: одна запись — одна строка
+
+    def _replay_journals(self) -> None:
+        """Операции из журналов упавших процессов, не дошедшие до базы (повтор безопасен)."""
+        for path in sorted(glob.glob(f"{glob.escape(self.path)}.pending-*.jsonl")):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue   # его уже доиграл другой процесс
+            try:
+                if not _try_lock(fd):
+                    continue   # владелец жив
+                with open(fd, "rb", closefd=False) as f:
+                    lines = f.read().split(b"\n")[:-1]   # недописанный хвост отбрасывается
+                ops = []
+                for line in lines:
+                    try:
+                        ops.append(orjson.loads(line))
+                    except orjson.JSONDecodeError:
+                        continue
+                if ops:
+                    self._write_batch(ops)
+                    log.info("Доиграно %d операций с тикетами из %s", len(ops), path)
+                os.unlink(path)
+            finally:
+                os.close(fd)
+
+    # ── запись ──────────────────────────────────────────────────────────
+    def _enqueue(self, op: dict) -> None:
+        with self._journal_lock:   # журнал не обнулится между записью операции и её постановкой в очередь
+            self._journal_append(op)
+            self._queue.put(op)
+
+    def create(self, description: str, email: str = None, session_id: str = None) -> dict:
+        """Тикет сразу виден чтениям; в базу он попадёт с ближайшей пачкой."""
+        now = time.time()
+        terms = terms_of(description)
+        ticket = {
+            "id": str(uuid.uuid4()), "email": (email or "").strip().lower() or None, "status": "open",
+            "created_at": now, "updated_at": now, "description": description,
+            "terms": " ".join(terms), "session_id": session_id,
+        }
+        with self._lock:
+            self._pending[ticket["id"]] = ticket
+        self._enqueue({"op": "insert", "ticket": ticket})
+        inc("tickets_created")
+        return dict(ticket)
+
+    def set_status(self, ticket_id: str, status: str) -> None:
+        if status not in STATUSES:
+            raise ValueError(f"Неизвестный статус тикета: {status}")
+        now = time.time()
+        with self._lock:
+            if ticket_id in self._pending:
+                self._pending[ticket_id].update(status=status, updated_at=now)
+            else:
+                self._pending_status[ticket_id] = (status, now)
+        self._enqueue({"op": "status", "id": ticket_id, "status": status, "updated_at": now})
+
+    def _write_batch(self, ops: list) -> None:
+        from sqlalchemy import bindparam, update
+        from sqlalchemy.dialects.sqlite import insert
+
+        tickets = {op["ticket"]["id"]: op["ticket"] for op in ops if op["op"] == "insert"}
+        statuses = [op for op in ops if op["op"] == "status"]
+        with self.engine.begin() as conn:
+            if tickets:
+                conn.execute(insert(self.table).on_conflict_do_nothing(index_elements=["id"]), list(tickets.values()))
+            if statuses:
+                conn.execute(
+                    update(self.table).where(self.table.c.id == bindparam("_id"))
+                    .values(status=bindparam("_status"), updated_at=bindparam("_updated_at")),
+                    [{"_id": op["id"], "_status": op["status"], "_updated_at": op["updated_at"]} for op in statuses],
+                )
+
+    def _run_writer(self) -> None:
+        while True:
+            op = self._queue.get()
+            if op is _STOP:
+                self._truncate_journal(pending=1)
+                self._queue.task_done()
+                return
+            if op is _FLUSH:
+                self._truncate_journal(pending=1)
+                self._queue.task_done()
+                continue
+            ops = [op]
+            deadline = time.monotonic() + self.flush_interval
+            while len(ops) < self.batch_size:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    self._queue.put(_STOP)   # сначала допишем пачку
+                if nxt is _STOP or nxt is _FLUSH:
+                    self._queue.task_done()
+                    break
+                ops.append(nxt)
+
+            start = time.perf_counter()
+            try:
+                self._write_batch(ops)
+            except Exception:
+                # база недоступна — операции остаются в журнале и доиграются при перезапуске
+                log.exception("Не удалось записать %d операций с тикетами", len(ops))
+                inc("ticket_write_errors")
+                self._keep_journal = True
+                for _ in ops:
+                    self._queue.task_done()
+                continue
+            observe("ticket_batch_seconds", time.perf_counter() - start)
+            inc("ticket_batch_ops", len(ops))
+
+            with self._lock:
+                for op in ops:
+                    if op["op"] == "insert":
+                        self._pending.pop(op["ticket"]["id"], None)
+                    elif self._pending_status.get(op["id"], (None, None))[1] == op["updated_at"]:
+                        del self._pending_status[op["id"]]
+            self._truncate_journal(pending=len(ops))
+            for _ in ops:
+                self._queue.task_done()
+
+    def _truncate_journal(self, pending: int) -> None:
+        """Обнуляет журнал, если всё из него уже в базе (в очереди только `pending` текущих операций)."""
+        with self._journal_lock:
+            if self._journal_fd is not None and not self._keep_journal and self._queue.unfinished_tasks == pending:
+                os.ftruncate(self._journal_fd, 0)
+
+    def flush(self) -> None:
+        """Ждёт, пока все поставленные в очередь операции окажутся в базе."""
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._writer.join()
+        if self._journal_fd is not None:
+            if not self._keep_journal:
+                os.unlink(self.journal_path)   # всё в базе
+            os.close(self._journal_fd)
+            self._journal_fd = None
+        self.engine.dispose()
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize()
+
+    # ── чтение ──────────────────────────────────────────────────────────
+    def _with_pending(self, rows, predicate) -> list:
+        """Строки базы + подходящие незаписанные тикеты, с неприменёнными статусами."""
+        with self._lock:
+            pending = [dict(t) for t in self._pending.values() if predicate(t)]
+            statuses = dict(self._pending_status)
+        out = {t["id"]: t for t in pending}
+        for row in rows:
+            t = dict(row._mapping)
+            if t["id"] in statuses:
+                t["status"], t["updated_at"] = statuses[t["id"]]
+            out.setdefault(t["id"], t)
+        return list(out.values())
+
+    def get(self, ticket_id: str):
+        from sqlalchemy import select
+
+        with self._lock:
+            if ticket_id in self._pending:
+                return dict(self._pending[ticket_id])
+        with self.engine.connect() as conn:
+            row = conn.execute(select(self.table).where(self.table.c.id == ticket_id)).first()
+        found = self._with_pending([row] if row else [], lambda t: False)
+        return found[0] if found else None
+
+    def open_tickets(self, email: str, limit: int = 20) -> list:
+        """Открытые тикеты пользователя, новые первыми (индекс email, status, created_at)."""
+        from sqlalchemy import select
+
+        email = email.strip().lower()
+        c = self.table.c
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table).where(c.email == email, c.status.in_(OPEN_STATUSES))
+                .order_by(c.created_at.desc()).limit(limit)
+            ).all()
+        tickets = self._with_pending(rows, lambda t: t["email"] == email)
+        tickets = [t for t in tickets if t["status"] in OPEN_STATUSES]
+        return sorted(tickets, key=lambda t: t["created_at"], reverse=True)[:limit]
+
+    def find_similar(self, description: str, email: str = None, session_id: str = None, *,
+                     window: float = TICKET_DEDUPE_WINDOW, threshold: float = TICKET_DEDUPE_THRESHOLD,
+                     limit: int = 5) -> list:
+        """[(похожесть, тикет)] открытых недавних обращений того же клиента, похожих на описание.
+
+        Клиент — email, а без него — session_id; без обоих искать не в чем
+        (обращения других клиентов не сравниваются и не возвращаются).
+        """
+        from sqlalchemy import select
+
+        c = self.table.c
+        if email:
+            email = email.strip().lower()
+            where, matches = [c.email == email], lambda t: t["email"] == email
+        elif session_id:
+            where, matches = [c.session_id == session_id], lambda t: t["session_id"] == session_id
+        else:
+            return []
+        wanted, since = set(terms_of(description)), time.time() - window
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.table).where(*where, c.status.in_(OPEN_STATUSES), c.created_at >= since)
+                .order_by(c.created_at.desc()).limit(200)
+            ).all()
+        scored = []
+        for t in self._with_pending(rows, lambda t: matches(t) and t["created_at"] >= since):
+            if t["status"] not in OPEN_STATUSES:
+                continue
+            score = similarity(wanted, set(t["terms"].split()))
+            if score >= threshold:
+                scored.append((score, t))
+        scored.sort(key=lambda st: (-st[0], -st[1]["created_at"]))
+        return scored[:limit]
+
+    def count(self) -> int:
+        from sqlalchemy import func, select
+
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(self.table)).scalar() + len(self._pending)
+
+
+def _try_lock(fd: int) -> bool:
+    """Эксклюзивный flock без ожидания: False — журнал держит живой процесс."""
+    if fcntl is None:
+        return False   # без flock (Windows) чужие журналы не доигрываются
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_ticket_store(path: str = None) -> TicketStore:
+    """Одно хранилище (и один пишущий поток) на файл базы в процессе; при выходе очередь дописывается."""
+    path = path or TICKET_DB_PATH
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = TicketStore(path)
+            atexit.register(_stores[path].close)
+        return _stores[path]
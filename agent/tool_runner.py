@@ -0,0 +1,124 @@
+"""
+Параллельное выполнение нескольких вызовов инструментов за один ход.
+
+Async-инструменты ожидаются в цикле событий, синхронные уходят в общий пул
+потоков; у каждого вызова свой таймаут (атрибут `timeout` инструмента,
+см. `tools.register`, иначе TOOL_TIMEOUT). Время хода — примерно максимум,
+а не сумма задержек инструментов.
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tools import registry
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "15"))
+TOOL_THREADS = int(os.getenv("TOOL_THREADS", "32"))
+
+_pool = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+
+
+def timeout_for(name: str, default: float = TOOL_TIMEOUT) -> float:
+    return getattr(registry.get(name), "timeout", default)
+
+
+def _call_sync(name: str, args):
+    """Вызов в потоке пула; async-инструмент получает собственный цикл событий."""
+    fn = registry[name]
+    result = fn(**args) if isinstance(args, dict) else fn(args)
+    if inspect.isawaitable(result):
+        result = asyncio.run(_await(result))
+    return result
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def _unknown(name: str) -> str:
+    return f"⚠️ Неизвестный инструмент: {name}"
+
+
+def _timed_out(name: str, timeout: float) -> str:
+    return f"⚠️ Инструмент {name} не ответил за {timeout:g} с"
+
+
+def _failed(name: str, error: Exception) -> str:
+    return f"⚠️ Ошибка инструмента {name}: {error}"
+
+
+def run_calls(calls: list, default_timeout: float = TOOL_TIMEOUT, on_done=None) -> list:
+    """[{'tool', 'args'}] → выводы в том же порядке (синхронный вариант).
+
+    on_done(call, output) вызывается в порядке завершения: быстрый инструмент
+    не ждёт более медленных, запущенных раньше него.
+    """
+    outputs = [None] * len(calls)
+
+    def finish(i: int, output) -> None:
+        outputs[i] = output
+        if on_done is not None:
+            on_done(calls[i], output)
+
+    start = time.monotonic()
+    deadlines = {}  # future → (номер вызова, таймаут, срок)
+    for i, call in enumerate(calls):
+        name = call["tool"]
+        if name not in registry:
+            finish(i, _unknown(name))
+            continue
+        timeout = timeout_for(name, default_timeout)
+        deadlines[_pool.submit(_call_sync, name, call["args"])] = (i, timeout, start + timeout)
+
+    while deadlines:
+        nearest = min(deadline for _, _, deadline in deadlines.values())
+        done, _ = wait(deadlines, timeout=max(0.0, nearest - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            i, _, _ = deadlines.pop(future)
+            try:
+                output = future.result()
+            except Exception as e:
+                output = _failed(calls[i]["tool"], e)
+            finish(i, output)
+        now = time.monotonic()
+        for future, (i, timeout, deadline) in list(deadlines.items()):
+            if deadline <= now:
+                del deadlines[future]
+                future.cancel()
+                finish(i, _timed_out(calls[i]["tool"], timeout))
+    return outputs
+
+
+async def _acall(name: str, args, timeout: float):
+    if name not in registry:
+        return _unknown(name)
+    fn = registry[name]
+    try:
+        if inspect.iscoroutinefunction(fn):
+            coro = fn(**args) if isinstance(args, dict) else fn(args)
+        else:
+            loop = asyncio.get_running_loop()
+            coro = loop.run_in_executor(_pool, _call_sync, name, args)
+        return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        return _timed_out(name, timeout)
+    except Exception as e:
+        return _failed(name, e)
+
+
+async def arun_calls(calls: list, default_timeout: float = TOOL_TIMEOUT, on_done=None) -> list:
+    """Асинхронный вариант run_calls для ainvoke графа; on_done — в порядке завершения."""
+    async def one(call):
+        output = await _acall(call["tool"], call["args"], timeout_for(call["tool"], default_timeout))
+        if on_done is not None:
+            on_done(call, output)
+        return output
+
+    return list(await asyncio.gather(*(one(c) for c in calls)))
+
+
+def merge_outputs(outputs: list) -> str:
+    return outputs[0] if len(outputs) == 1 else "\n\n".join(str(o) for o in outputs)
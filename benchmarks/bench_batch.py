@@ -0,0 +1,46 @@
+"""
+Пропускная способность пакетного режима с заглушкой LLM.
+
+Запуск: python benchmarks/bench_batch.py [--items 400] [--latency 0.05] [--duplicates 0.3]
+Генерирует JSONL с заданной долей повторяющихся вопросов и прогоняет его
+через agent.batch при разной параллельности; печатает обращений/с, число
+прогонов графа и p50/p95 задержки одного обращения.
+"""
+
+import argparse, json, pathlib, sys, tempfile
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.batch import run_batch
+from agent.graph_builder import build_graph
+from agent.stub_llm import StubLLM
+
+CONCURRENCY_LEVELS = [1, 8, 32, 128]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки LLM, с")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="доля повторных вопросов")
+    args = parser.parse_args()
+
+    unique = max(1, int(args.items * (1 - args.duplicates)))
+    with tempfile.TemporaryDirectory() as tmp:
+        inbox = pathlib.Path(tmp) / "inbox.jsonl"
+        with open(inbox, "w", encoding="utf-8") as f:
+            for i in range(args.items):
+                f.write(json.dumps({"id": i, "message": f"Вопрос клиента {i % unique}"}, ensure_ascii=False) + "\n")
+
+        print(f"{args.items} items, {unique} unique, LLM latency {args.latency * 1e3:.0f} ms")
+        print(f"{'workers':>8} | {'items/s':>8} | {'graph runs':>10} | {'p50, ms':>8} | {'p95, ms':>8}")
+        for workers in CONCURRENCY_LEVELS:
+            out = pathlib.Path(tmp) / f"out-{workers}.jsonl"
+            r = run_batch(str(inbox), str(out), build_graph(llm=StubLLM(latency=args.latency)),
+                          concurrency=workers).summary()
+            print(f"{workers:>8} | {r['items_per_s']:>8.1f} | {r['processed']:>10} "
+                  f"| {r['p50_ms']:>8.1f} | {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
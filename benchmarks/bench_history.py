@@ -0,0 +1,65 @@
+"""
+Размер промпта и задержка LLM на длинной сессии: полная история против окна с резюме.
+
+Запуск: python benchmarks/bench_history.py [--turns 500] [--budget 2000]
+Каждые 50 ходов история отправляется в заглушку LLM (agent.stub_llm), задержка
+которой растёт линейно с длиной промпта (--ms-per-1k-tokens на тысячу слов),
+как у настоящей модели на этапе prefill, — и вызовы замеряются: полная история
+против prompt_messages() с окном и резюме.
+"""
+
+import argparse, pathlib, random, sys, tempfile, time
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.history import ExtractiveSummarizer, HistoryManager, estimate_tokens
+from agent.session_store import SessionStore
+from agent.stub_llm import StubLLM
+
+WORDS = "заказ доставка возврат пароль оплата курьер адрес статус карта скидка товар размер".split()
+
+
+def message(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(8, 40)))
+
+
+def timed_call(llm: StubLLM, messages: list) -> float:
+    start = time.perf_counter()
+    llm.invoke(messages + [{"role": "user", "content": "вопрос"}])
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--budget", type=int, default=2000, help="бюджет окна истории, токенов")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20.0)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    llm = StubLLM(reply=lambda messages: "ок", prompt_token_latency=args.ms_per_1k_tokens / 1e6)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(tmp, compact_every=0)
+        history = HistoryManager(store, budget_tokens=args.budget,
+                                 summarizer=ExtractiveSummarizer())
+        full_tokens = 0
+        print(f"{'turn':>5} | {'full, tok':>9} | {'managed, tok':>12} | {'full LLM, ms':>12} | "
+              f"{'managed LLM, ms':>15} | {'history ops, µs':>15}")
+        for turn in range(1, args.turns + 1):
+            user, ai = message(rng), message(rng)
+            start = time.perf_counter()
+            history.add_turn("bench", user, ai)
+            managed_tokens = history.prompt_tokens("bench")
+            ops_us = (time.perf_counter() - start) * 1e6
+            full_tokens += estimate_tokens(user) + estimate_tokens(ai) + 8
+
+            if turn == 1 or turn % 50 == 0:
+                full = [r for r in store.load("bench") if "role" in r]
+                full_ms = timed_call(llm, full)
+                managed_ms = timed_call(llm, history.prompt_messages("bench"))
+                print(f"{turn:>5} | {full_tokens:>9} | {managed_tokens:>12} | "
+                      f"{full_ms:>12.1f} | {managed_ms:>15.1f} | {ops_us:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Внешние вызовы инструментов: новый HTTP-клиент на каждый запрос против общего пула.
+
+Запуск: python benchmarks/bench_http_client.py [--requests 300] [--latency 0.02]
+Поднимает локальный сервер-заглушку. Печатает среднее время запроса
+(последовательно) и число запросов, дошедших до сервера, когда 50 потоков
+одновременно спрашивают одно и то же.
+"""
+
+import argparse, json, pathlib, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from agent.http_client import HttpClient
+
+
+def start_server(latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            with server.lock:
+                server.hits += 1
+            time.sleep(latency)
+            data = json.dumps({"organic": [{"snippet": "ok"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.lock, server.hits = threading.Lock(), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/search"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка сервера-заглушки, с")
+    args = parser.parse_args()
+
+    server, url = start_server(args.latency)
+    body = {"q": "доставка"}
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        with httpx.Client() as fresh:   # как GoogleSerperAPIWrapper: новая сессия на вызов
+            fresh.post(url, json=body).json()
+    fresh_ms = (time.perf_counter() - start) / args.requests * 1e3
+
+    pooled = HttpClient(rate_limit=0)
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        pooled.post(url, json_body=body)
+    pooled_ms = (time.perf_counter() - start) / args.requests * 1e3
+
+    print(f"server latency {args.latency * 1e3:.0f} ms, {args.requests} sequential requests")
+    print(f"{'client':>22} | {'ms/request':>10}")
+    print(f"{'new client per call':>22} | {fresh_ms:>10.2f}")
+    print(f"{'shared pool':>22} | {pooled_ms:>10.2f}")
+
+    server.hits = 0
+    with ThreadPoolExecutor(50) as pool:
+        list(pool.map(lambda _: pooled.post(url, json_body=body, coalesce=True), range(50)))
+    print(f"50 identical concurrent searches → {server.hits} upstream request(s), "
+          f"coalesced {pooled.stats()['coalesced']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Задержка поиска по базе знаний в зависимости от её размера.
+
+Запуск: python benchmarks/bench_knowledge_base.py
+Сравнивает индексированный KnowledgeBase с прежней реализацией
+(json.load + два линейных прохода на каждый вызов) и показывает время
+ранжированного BM25-поиска top-k.
+"""
+
+import json, os, pathlib, random, sys, tempfile, time
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.knowledge_base import KnowledgeBase
+
+SIZES = [5, 100, 1_000, 10_000, 100_000]
+WORDS = ("доставка заказ возврат товар оплата карта гарантия пароль адрес статус "
+         "курьер пункт выдачи скидка промокод чек размер цвет модель аккаунт").split()
+CATEGORIES = ["shipping", "returns", "payment", "product_info", "account"]
+
+
+def make_items(n: int, rng: random.Random) -> list:
+    return [
+        {
+            "category": rng.choice(CATEGORIES),
+            "question": " ".join(rng.choices(WORDS, k=5)) + f" №{i}?",
+            "answer": f"Ответ {i}",
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_lookup(path: str, query: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        kb_data = json.load(f)
+    q = query.lower().strip()
+    for item in kb_data:
+        if item.get("question", "").lower().strip() == q:
+            return [item]
+    return [it for it in kb_data if q in it.get("question", "").lower() or q in it.get("category", "").lower()]
+
+
+def timeit(fn, queries, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in queries:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'entries':>8} | {'build, ms':>9} | {'indexed, µs':>11} | {'legacy, µs':>10} | {'bm25, µs':>9}")
+    for n in SIZES:
+        items = make_items(n, rng)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "kb.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False)
+
+            queries = [items[n // 2]["question"], f"№{n - 1}?", "отсутствующий вопрос"]
+
+            kb = KnowledgeBase(path)
+            start = time.perf_counter()
+            len(kb)
+            build_ms = (time.perf_counter() - start) * 1e3
+
+            indexed = timeit(kb.lookup, queries, repeat=200)
+            kb.search("прогрев")  # построение BM25-статистик не входит в замер
+            ranked = timeit(kb.search, [f"модель {n - 1}", "скидка по промокоду", "когда курьер привезет"], repeat=20)
+            legacy = timeit(lambda q: legacy_lookup(path, q), queries, repeat=max(1, 2_000 // n))
+        print(f"{n:>8} | {build_ms:>9.1f} | {indexed:>11.1f} | {legacy:>10.1f} | {ranked:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Цена инструментирования на горячем пути.
+
+Запуск: python benchmarks/bench_metrics.py [--calls 200000]
+Сравнивает вызов пустого инструмента без обёртки, с agent.metrics.timed,
+с прежним print в stdout и с logging.debug при выключенном уровне.
+"""
+
+import argparse, io, logging, pathlib, sys, time
+from contextlib import redirect_stdout
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.metrics import Metrics
+
+log = logging.getLogger("bench")
+
+
+def bare(q: str) -> str:
+    return q
+
+
+def with_print(q: str) -> str:
+    print(f"--- ВЫЗВАН инструмент с запросом: '{q}' ---")
+    return q
+
+
+def with_log(q: str) -> str:
+    log.debug("инструмент: %r", q)
+    return q
+
+
+def per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn("вопрос")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    m = Metrics()
+    rows = [
+        ("bare call", per_call_us(bare, args.calls)),
+        ("metrics.timed", per_call_us(m.timed("tool", tool="bench")(bare), args.calls)),
+        ("logging.debug (off)", per_call_us(with_log, args.calls)),
+    ]
+    with redirect_stdout(io.StringIO()):
+        rows.append(("print (to buffer)", per_call_us(with_print, args.calls)))
+    with open("/dev/null", "w") as null, redirect_stdout(null):
+        rows.append(("print (to /dev/null)", per_call_us(with_print, args.calls)))
+
+    print(f"{'variant':>22} | {'µs/call':>8}")
+    for name, us in rows:
+        print(f"{name:>22} | {us:>8.2f}")
+    print(f"p50/p95/p99 of the timed calls: {m.histogram('tool_seconds', tool='bench')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Время хода с несколькими инструментами: последовательно против параллельно.
+
+Запуск: python benchmarks/bench_parallel_tools.py
+Инструменты имитируют задержку (поиск в базе, веб-поиск, статус заказа);
+при параллельном выполнении время хода ≈ max(задержек), а не их сумме.
+"""
+
+import asyncio, pathlib, sys, time
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from tools import register
+from agent.tool_runner import arun_calls, run_calls
+
+LATENCIES = {"_bench_kb": 0.05, "_bench_search": 0.30, "_bench_order": 0.15}
+
+
+@register
+def _bench_kb(q: str) -> str:
+    time.sleep(LATENCIES["_bench_kb"])
+    return "kb"
+
+
+@register
+async def _bench_search(q: str) -> str:
+    await asyncio.sleep(LATENCIES["_bench_search"])
+    return "search"
+
+
+@register
+def _bench_order(q: str) -> str:
+    time.sleep(LATENCIES["_bench_order"])
+    return "order"
+
+
+CALLS = [{"tool": name, "args": "q"} for name in LATENCIES]
+
+
+def sequential() -> None:
+    for c in CALLS:
+        if c["tool"] == "_bench_search":
+            asyncio.run(_bench_search(c["args"]))
+        else:
+            globals()[c["tool"]](c["args"])
+
+
+def measure(fn, repeat: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    print("tool latencies, ms: " + ", ".join(f"{k[7:]}={v * 1e3:.0f}" for k, v in LATENCIES.items()))
+    print(f"sum = {sum(LATENCIES.values()) * 1e3:.0f} ms, max = {max(LATENCIES.values()) * 1e3:.0f} ms")
+    print(f"{'mode':>18} | {'wall, ms':>8}")
+    print(f"{'sequential':>18} | {measure(sequential):>8.1f}")
+    print(f"{'parallel (sync)':>18} | {measure(lambda: run_calls(CALLS)):>8.1f}")
+    print(f"{'parallel (async)':>18} | {measure(lambda: asyncio.run(arun_calls(CALLS))):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
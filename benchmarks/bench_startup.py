@@ -0,0 +1,45 @@
+"""
+Время холодного старта: импорт графа, сборка графа и импорт CLI (main.py).
+
+Запуск: python benchmarks/bench_startup.py [--repeat 5]
+Каждый замер — отдельный процесс интерпретатора; печатается медиана.
+Первая строка — импорт без кэша манифеста инструментов (tools/.manifest.json).
+"""
+
+import argparse, os, pathlib, statistics, subprocess, sys, time
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+MANIFEST = ROOT / "tools" / ".manifest.json"
+
+CASES = [
+    ("import agent.graph_builder", "import agent.graph_builder"),
+    ("import + build_graph()", "from agent.graph_builder import build_graph; build_graph()"),
+    ("build_graph() + 1 turn", "from agent.graph_builder import build_graph; build_graph().invoke({'user_input': 'мир'})"),
+    ("import main (CLI)", "import main"),
+]
+
+
+def run(code: str) -> float:
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}  # ключ для старта не нужен
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(run("pass") for _ in range(args.repeat))
+    print(f"{'case':>28} | {'median, ms':>10}")
+    print(f"{'python -c pass':>28} | {baseline:>10.0f}")
+
+    MANIFEST.unlink(missing_ok=True)
+    print(f"{'graph import, no manifest':>28} | {run(CASES[0][1]):>10.0f}")
+    for name, code in CASES:
+        print(f"{name:>28} | {statistics.median(run(code) for _ in range(args.repeat)):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
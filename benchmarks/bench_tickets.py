@@ -0,0 +1,114 @@
+"""
+Хранилище тикетов на большом объёме.
+
+Запуск: python benchmarks/bench_tickets.py [--tickets 1000000] [--users 50000] [--creates 20000]
+Наполняет базу синтетическими тикетами пачками по 10 000 (тот же путь, что и
+у пишущего потока), затем меряет create() в потоке агента (мкс на тикет —
+запись в журнал и очередь, без ожидания диска), пропускную способность
+фоновой записи и p50/p99 запросов: открытые тикеты пользователя, поиск
+похожих обращений, тикет по id. В конце — план запроса открытых тикетов
+(должен идти по индексу, без SCAN всей таблицы).
+"""
+
+import argparse, pathlib, random, statistics, sys, tempfile, time, uuid
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.tickets import TicketStore, terms_of
+
+ISSUES = [
+    "Не приходит письмо для сброса пароля",
+    "Заказ не доставлен в срок",
+    "Списали деньги дважды за один заказ",
+    "Не работает оплата картой",
+    "Хочу вернуть товар надлежащего качества",
+    "Не могу изменить адрес доставки",
+    "Промокод не применяется при оформлении",
+    "Приложение вылетает при входе в аккаунт",
+]
+STATUSES = ["open"] * 2 + ["in_progress"] + ["closed"] * 7
+SEED_BATCH = 10_000
+
+
+def _quantiles(samples: list) -> tuple:
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1e3, ordered[int(0.99 * (len(ordered) - 1))] * 1e3
+
+
+def _seed(store: TicketStore, n: int, users: int) -> float:
+    prepared = []
+    for issue in ISSUES:
+        prepared.append((issue, " ".join(terms_of(issue))))
+    now, rnd = time.time(), random.Random(0)
+    start = time.perf_counter()
+    for base in range(0, n, SEED_BATCH):
+        ops = []
+        for _ in range(min(SEED_BATCH, n - base)):
+            issue, terms = rnd.choice(prepared)
+            created = now - rnd.uniform(0, 365 * 24 * 3600)
+            ops.append({"op": "insert", "ticket": {
+                "id": str(uuid.uuid4()), "email": f"user{rnd.randrange(users)}@example.com",
+                "status": rnd.choice(STATUSES), "created_at": created, "updated_at": created,
+                "description": issue, "terms": terms, "session_id": f"s{rnd.randrange(users)}",
+            }})
+        store._write_batch(ops)
+    return time.perf_counter() - start
+
+
+def _measure(fn, calls: int) -> tuple:
+    samples = []
+    for i in range(calls):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return _quantiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--creates", type=int, default=20_000, help="тикетов через create()")
+    parser.add_argument("--queries", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TicketStore(str(pathlib.Path(tmp) / "tickets.db"))
+        seed_s = _seed(store, args.tickets, args.users)
+        print(f"seeded {args.tickets} tickets ({args.users} users) in {seed_s:.1f} s "
+              f"({args.tickets / seed_s:,.0f} rows/s)")
+
+        rnd = random.Random(1)
+        t0 = time.perf_counter()
+        ids = [store.create(rnd.choice(ISSUES), f"user{rnd.randrange(args.users)}@example.com")["id"]
+               for _ in range(args.creates)]
+        create_s = time.perf_counter() - t0
+        store.flush()
+        total_s = time.perf_counter() - t0
+        print(f"create(): {create_s / args.creates * 1e6:.1f} us/ticket on the caller; "
+              f"background writer drained {args.creates} in {total_s:.2f} s ({args.creates / total_s:,.0f}/s)")
+
+        emails = [f"user{rnd.randrange(args.users)}@example.com" for _ in range(args.queries)]
+        sessions = [f"s{rnd.randrange(args.users)}" for _ in range(args.queries)]
+        issues = [rnd.choice(ISSUES) for _ in range(args.queries)]
+        rows = [
+            ("open_tickets(email)", _measure(lambda i: store.open_tickets(emails[i]), args.queries)),
+            ("find_similar(text, email)", _measure(lambda i: store.find_similar(issues[i], emails[i]), args.queries)),
+            ("find_similar(text, session)", _measure(lambda i: store.find_similar(issues[i], session_id=sessions[i]),
+                                                     args.queries)),
+            ("get(id)", _measure(lambda i: store.get(ids[i % len(ids)]), args.queries)),
+        ]
+        print(f"{'query':<28} | {'p50, ms':>8} | {'p99, ms':>8}")
+        for name, (p50, p99) in rows:
+            print(f"{name:<28} | {p50:>8.3f} | {p99:>8.3f}")
+
+        with store.engine.connect() as conn:
+            plan = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT * FROM tickets WHERE email = ? AND status IN ('open', 'in_progress') "
+                "ORDER BY created_at DESC LIMIT 20", ("user1@example.com",)).all()
+        print("open_tickets plan:", "; ".join(row[-1] for row in plan))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Нагрузочный прогон асинхронного сервиса с заглушкой LLM.
+
+Запуск: python benchmarks/load_test.py [--latency 0.05] [--token-latency 0.01] [--turns 20]
+Для 1, 10 и 100 одновременных сессий печатает запросы/с, p50/p99 полного
+ответа и p50/p99 времени до первого токена (TTFT) — ходы идут через
+AgentService.stream. Каждая сессия отправляет `turns` сообщений подряд, как живой клиент.
+"""
+
+import argparse, asyncio, pathlib, statistics, sys, time
+
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.graph_builder import build_graph
+from agent.service import AgentService
+from agent.stub_llm import StubLLM
+
+CONCURRENCY_LEVELS = [1, 10, 100]
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_level(sessions: int, turns: int, latency: float, token_latency: float,
+                    max_concurrency: int) -> dict:
+    service = AgentService(build_graph(llm=StubLLM(latency=latency, token_latency=token_latency)),
+                           max_concurrency=max_concurrency, max_pending=sessions * 2)
+    latencies, ttfts = [], []
+
+    async def client(sid: str) -> None:
+        for i in range(turns):
+            start, first = time.perf_counter(), None
+            async for event in service.stream(sid, f"вопрос {i}"):
+                if first is None and event["type"] == "token":
+                    first = time.perf_counter() - start
+            latencies.append(time.perf_counter() - start)
+            ttfts.append(first)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(f"s{n}") for n in range(sessions)))
+    wall = time.perf_counter() - start
+    return {
+        "rps": len(latencies) / wall,
+        "p50": statistics.median(latencies) * 1e3,
+        "p99": percentile(latencies, 0.99) * 1e3,
+        "ttft50": statistics.median(ttfts) * 1e3,
+        "ttft99": percentile(ttfts, 0.99) * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки LLM, с")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="пауза между токенами заглушки, с")
+    parser.add_argument("--turns", type=int, default=20, help="сообщений на сессию")
+    parser.add_argument("--max-concurrency", type=int, default=64, help="лимит одновременных вызовов LLM")
+    args = parser.parse_args()
+
+    print(f"LLM latency {args.latency * 1e3:.0f} ms + {args.token_latency * 1e3:.0f} ms/token, "
+          f"{args.turns} turns/session, max_concurrency={args.max_concurrency}")
+    print(f"{'sessions':>8} | {'req/s':>8} | {'p50, ms':>8} | {'p99, ms':>8} | {'TTFT p50':>8} | {'TTFT p99':>8}")
+    for sessions in CONCURRENCY_LEVELS:
+        r = asyncio.run(run_level(sessions, args.turns, args.latency, args.token_latency, args.max_concurrency))
+        print(f"{sessions:>8} | {r['rps']:>8.1f} | {r['p50']:>8.1f} | {r['p99']:>8.1f} "
+              f"| {r['ttft50']:>8.1f} | {r['ttft99']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,57 @@
 import os
+import logging
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.tools import tool
-from langchain_community.utilities.google_serper import GoogleSerperAPIWrapper 
 from datetime import datetime
-import json 
 import uuid 
+import asyncio
 from agent.graph_builder import build_graph
+from agent.streaming import astream_agent, print_event, stream_graph
+from agent.session_store import SessionStore
+from agent.history import HistoryManager, LLMSummarizer
+from agent.cache import MISSING, cached, get_cache, kb_version, make_key
+from tools.knowledge_base import get_from_knowledge_base as kb_lookup
+from tools.website import perform_website_action as website_action
+from tools.search import serper_search as search_lookup
+from tools.tickets import create_support_ticket as ticket_create, get_open_tickets as ticket_open_list
+from agent.router import Router
+from agent.tool_runner import merge_outputs, run_calls
+from agent.llm import get_llm
+from agent.log import configure_logging
+from agent.metrics import llm_callback_handler, metrics
 from dotenv import load_dotenv
 load_dotenv()        # подхватывает файл .env рядом с проектом
 
 if __name__ == "__main__":
+    configure_logging()
     graph = build_graph()
     while True:
         user = input("⮕  ")
         if user.lower() in {"exit", "quit"}:
             break
-        res = graph.invoke({"user_input": user})
-        print(res["response"])
+        for event in stream_graph(graph, {"user_input": user}):
+            print_event(event)
 
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 
+log = logging.getLogger("agent.main")
+
+# куда сохранить метрики (JSON) при выходе; пусто — не сохранять
+METRICS_DUMP = os.getenv("METRICS_DUMP", "")
+
 # --- ОПРЕДЕЛЕНИЕ ИНСТРУМЕНТОВ ---
+# Обычные функции; в LangChain-инструменты они оборачиваются в main(), чтобы
+# импорт модуля не тянул langchain.
+
+def _is_answer(result: str) -> bool:
+    """Сообщения об ошибках не кэшируем."""
+    return not result.startswith(("Ошибка", "Произошла ошибка"))
 
-@tool
 def say_hello(name: str) -> str:
     """Говорит привет указанному человеку."""
     return f"Привет, {name}!"
 
-@tool
 def calculate(expression: str) -> str:
     """Вычисляет математическое выражение.
     Например, '2+2' или '10/3'.
@@ -42,80 +61,27 @@ def calculate(expression: str) -> str:
     except Exception as e:
         return f"Ошибка при вычислении: {e}"
 
-@tool
 def get_current_datetime() -> str:
     """Возвращает текущую дату и время в читаемом формате."""
     now = datetime.now()
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
-@tool
+@cached("tool:serper_search", cache_if=_is_answer)
 def serper_search(query: str) -> str:
     """Использует Serper.dev API для поиска информации по заданному запросу.
     Полезен, когда нужно найти актуальную информацию, новости или ответы на вопросы,
     которых нет во внутренней базе знаний.
     """
-    print(f"--- ВЫЗВАН serper_search с запросом: '{query}' ---")
-    
-    serper_api_key_env = os.getenv("SERPER_API_KEY") 
-
-    if not serper_api_key_env:
-        print("--- ОШИБКА: SERPER_API_KEY не настроен. Проверьте .env ---")
-        return "Ошибка: SERPER_API_KEY не настроен. Пожалуйста, проверьте файл .env."
+    return search_lookup(query)
 
-    try:
-        search = GoogleSerperAPIWrapper() 
-        result = search.run(query)
-        print(f"--- Serper API вернул результат (часть): {result[:200]}... ---")
-        return result
-    except Exception as e:
-        print(f"--- ОШИБКА Serper API: {e} ---")
-        return f"Произошла ошибка при поиске информации: {e}"
-
-@tool
+@cached("tool:get_from_knowledge_base", kb_dependent=True, cache_if=_is_answer)
 def get_from_knowledge_base(query: str) -> str:
     """Использует внутреннюю базу знаний для поиска ответов на часто задаваемые вопросы.
     Полезен для получения информации о доставке, возвратах, характеристиках продуктов и т.д.
     Используй этот инструмент, если вопрос пользователя похож на запрос к FAQ или внутренней информации.
     """
-    print(f"--- ВЫЗВАН get_from_knowledge_base с запросом: '{query}' ---")
-    try:
-        with open("knowledge_base.json", "r", encoding="utf-8") as f:
-            kb_data = json.load(f)
-        
-        query_lower = query.lower().strip() 
-        
-        found_answers = []
-        for item in kb_data:
-            if item.get("question", "").lower().strip() == query_lower:
-                found_answers.append(f"Категория: {item['category']}\nВопрос: {item['question']}\nОтвет: {item['answer']}")
-                break 
-        
-        if found_answers:
-            print(f"--- Найдено ответов в базе знаний: {len(found_answers)} ---")
-            return "\n\n".join(found_answers)
-        else:
-            for item in kb_data:
-                if query_lower in item.get("question", "").lower() or \
-                   query_lower in item.get("category", "").lower():
-                    found_answers.append(f"Категория: {item['category']}\nВопрос: {item['question']}\nОтвет: {item['answer']}")
-            
-            if found_answers:
-                print(f"--- Найдено ответов в базе знаний (по подстроке): {len(found_answers)} ---")
-                return "\n\n".join(found_answers)
-            else:
-                print("--- В базе знаний не найдено подходящих ответов. ---")
-                return "Внутренняя база знаний не содержит информации по вашему запросу."
-    except FileNotFoundError:
-        print("--- ОШИБКА: Файл knowledge_base.json не найден. ---")
-        return "Ошибка: Внутренняя база знаний недоступна."
-    except json.JSONDecodeError:
-        print("--- ОШИБКА: Ошибка чтения JSON файла knowledge_base.json. ---")
-        return "Ошибка: Внутренняя база знаний повреждена."
-    except Exception as e:
-        print(f"--- ОШИБКА в get_from_knowledge_base: {e} ---")
-        return f"Произошла ошибка при доступе к внутренней базе знаний: {e}"
+    return kb_lookup(query)
 
-@tool
 def store_user_preference(preference_key: str, preference_value: str) -> str:
     """Сохраняет предпочтение пользователя для персонализации будущих ответов.
     Используй этот инструмент, когда пользователь явно указывает свои предпочтения,
@@ -123,33 +89,26 @@ def store_user_preference(preference_key: str, preference_value: str) -> str:
     preference_key: ключ для предпочтения (например, 'имя', 'способ_связи', 'регион').
     preference_value: значение предпочтения (например, 'Андрей', 'email', 'Москва').
     """
-    print(f"--- ВЫЗВАН store_user_preference: ключ='{preference_key}', значение='{preference_value}' ---")
+    log.debug("store_user_preference: ключ=%r, значение=%r", preference_key, preference_value)
     return f"Предпочтение '{preference_key}' со значением '{preference_value}' сохранено для будущих ответов."
 
-@tool
 def create_support_ticket(issue_description: str, user_email: str = None) -> str:
     """Создает новый тикет в системе поддержки с описанием проблемы пользователя.
     Используй этот инструмент, когда пользователь явно просит о помощи с проблемой, которую агент не может решить напрямую,
-    или когда требуется дальнейшее рассмотрение специалистом.
+    или когда требуется дальнейшее рассмотрение специалистом. Если похожий тикет пользователя уже открыт, новый не создается.
     issue_description: подробное описание проблемы, с которой столкнулся пользователь.
     user_email: (необязательно) адрес электронной почты пользователя для отправки подтверждения.
     """
-    ticket_id = str(uuid.uuid4())[:8] 
-    
-    print(f"--- ВЫЗВАН create_support_ticket: описание='{issue_description}', email='{user_email}' ---")
-    
-    response_message = (
-        f"Тикет поддержки №{ticket_id} успешно создан.\n"
-        f"Описание проблемы: '{issue_description}'.\n"
-    )
-    if user_email:
-        response_message += f"Подтверждение будет отправлено на ваш email: {user_email}."
-    else:
-        response_message += "Наш специалист свяжется с вами в ближайшее время."
-        
-    return response_message
-
-@tool
+    return ticket_create(issue_description, user_email)
+
+def get_open_tickets(user_email: str) -> str:
+    """Возвращает открытые тикеты поддержки пользователя по его email.
+    Используй этот инструмент, когда пользователь спрашивает о статусе своих обращений
+    или перед созданием нового тикета, чтобы не дублировать уже открытое обращение.
+    user_email: адрес электронной почты пользователя.
+    """
+    return ticket_open_list(user_email)
+
 def perform_website_action(action_type: str, details: str) -> str:
     """Имитирует выполнение действия на веб-сайте, такого как сброс пароля,
     проверка статуса заказа, обновление профиля и т.д.
@@ -158,46 +117,91 @@ def perform_website_action(action_type: str, details: str) -> str:
     action_type: Тип действия, которое нужно выполнить (например, 'сброс пароля', 'проверить статус заказа', 'обновить адрес').
     details: Дополнительные детали, необходимые для выполнения действия (например, email, номер заказа, новый адрес).
     """
-    print(f"--- ВЫЗВАН perform_website_action: тип='{action_type}', детали='{details}' ---")
-    
-    if action_type.lower() == "сброс пароля":
-        return f"Действие '{action_type}' для {details} имитировано: Инструкции по сбросу пароля отправлены на {details}."
-    elif action_type.lower() == "проверить статус заказа":
-        return f"Действие '{action_type}' для заказа {details} имитировано: Статус заказа {details} - 'В обработке', ожидаемая дата доставки 2-3 дня."
-    elif action_type.lower() == "обновить адрес":
-        return f"Действие '{action_type}' для адреса '{details}' имитировано: Ваш адрес успешно обновлен до '{details}'."
-    else:
-        return f"Действие '{action_type}' с деталями '{details}' имитировано: Запрос на выполнение действия получен. Специалист скоро свяжется с вами."
+    return website_action(action_type, details)
+
+# --- КЭШ ОТВЕТОВ АГЕНТА ---
+
+# ответ агента можно переиспользовать, только если он построен на чистых инструментах
+# (FAQ/поиск) — без предпочтений пользователя, тикетов и действий на сайте
+CACHEABLE_AGENT_TOOLS = {"get_from_knowledge_base", "serper_search"}
+
+def is_cacheable_turn(response: dict) -> bool:
+    steps = response.get("intermediate_steps") or []
+    return bool(steps) and all(action.tool in CACHEABLE_AGENT_TOOLS for action, _ in steps)
+
+def history_digest(chat_history: list) -> str:
+    """Отпечаток истории промпта: ответ LLM зависит от неё (контекст диалога, имя и предпочтения клиента)."""
+    raw = [(getattr(m, "type", ""), str(getattr(m, "content", m))) for m in chat_history or ()]
+    return make_key("history", raw) if raw else ""
+
+def log_cache_stats():
+    for namespace, counters in sorted(get_cache().stats().items()):
+        log.info("Кэш %s: %s", namespace, counters)
+
+# --- БЫСТРЫЙ МАРШРУТ БЕЗ LLM ---
+
+# статус заказа, сброс пароля и уверенные совпадения с FAQ обслуживаются напрямую
+fast_router = Router()
+
+def try_fast_route(user_input: str):
+    """Ответ инструмента, если намерение распознано без LLM, иначе None."""
+    routes = fast_router.plan(user_input)
+    if routes[0].source not in ("rule", "kb"):
+        return None
+    log.info("Быстрый маршрут: %s", ", ".join(f"{r.source}/{r.intent} → {r.tool}" for r in routes))
+    return merge_outputs(run_calls([{"tool": r.tool, "args": r.args} for r in routes]))
+
+async def stream_agent_answer(agent_executor, cache, user_input: str, chat_history: list):
+    """События ответа LLM-агента (токены, статусы инструментов) с кэшем по вопросу и истории сессии.
+
+    Ответ переиспользуется только при той же истории промпта: иначе уточняющий
+    вопрос получил бы ответ из контекста чужой сессии, а персональный ответ
+    (по имени и предпочтениям клиента) ушёл бы другому клиенту.
+    """
+    cache_key = make_key("agent", user_input, _kb=kb_version(), _history=history_digest(chat_history))
+    output = cache.get(cache_key)
+    if output is not MISSING:
+        log.info("Ответ взят из кэша")
+        yield {"type": "token", "content": output}
+        yield {"type": "done", "response": output}
+        return
+    inputs = {"input": user_input, "chat_history": chat_history}
+    async for event in astream_agent(agent_executor, inputs, config={"callbacks": [llm_callback_handler("agent")]}):
+        if event["type"] == "done" and is_cacheable_turn(event["result"]):
+            cache.set(cache_key, event["response"])
+        yield event
+
+async def print_agent_answer(agent_executor, cache, user_input: str, chat_history: list) -> str:
+    """Печатает ответ агента по мере генерации и возвращает его целиком."""
+    output = ""
+    async for event in stream_agent_answer(agent_executor, cache, user_input, chat_history):
+        print_event(event)
+        if event["type"] == "done":
+            output = event["response"]
+    return output
 
 # --- ЛОГИКА УПРАВЛЕНИЯ СЕССИЯМИ ---
 
-SESSION_DIR = "sessions"
-
-def load_session_history(session_id: str) -> list:
-    """Загружает историю чата для данной сессии из файла."""
-    session_file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
-    if os.path.exists(session_file_path):
-        with open(session_file_path, "r", encoding="utf-8") as f:
-            try:
-                history = json.load(f)
-                print(f"--- История сессии '{session_id}' загружена. ---")
-                return history
-            except json.JSONDecodeError:
-                print(f"--- Ошибка чтения истории сессии '{session_id}'. Создаем новую. ---")
-                return []
-    print(f"--- Новая сессия '{session_id}' инициализирована. ---")
+session_store = SessionStore()
+
+def load_session_history(history: HistoryManager, session_id: str) -> list:
+    """Резюме и последние реплики сессии в пределах бюджета токенов."""
+    if session_store.exists(session_id):
+        chat_history = history.prompt_messages(session_id)
+        log.info("История сессии '%s' загружена", session_id)
+        return chat_history
+    log.info("Новая сессия '%s' инициализирована", session_id)
     return []
 
-def save_session_history(session_id: str, chat_history: list):
-    """Сохраняет историю чата для данной сессии в файл."""
-    os.makedirs(SESSION_DIR, exist_ok=True) 
-    session_file_path = os.path.join(SESSION_DIR, f"{session_id}.json")
-    with open(session_file_path, "w", encoding="utf-8") as f:
-        json.dump(chat_history, f, ensure_ascii=False, indent=4)
-    print(f"--- История сессии '{session_id}' сохранена. ---")
+def save_session_turn(history: HistoryManager, session_id: str, user_input: str, output: str):
+    """Дописывает ход в историю; старые ходы при необходимости сворачиваются в резюме."""
+    history.add_turn(session_id, user_input, output)
+    log.info("История сессии '%s' сохранена", session_id)
 
 
 def main():
+    configure_logging()
+
     # Проверка ключа Gemini
     google_api_key = os.getenv("GEMINI_API_KEY")
     if not google_api_key:
@@ -205,10 +209,14 @@ def main():
         print("Пожалуйста, установите ее в файле .env.")
         return
 
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest", google_api_key=google_api_key)
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import tool
+
+    llm = get_llm("gemini-1.5-flash-latest", google_api_key)
 
     # Список всех доступных инструментов
-    tools = [
+    tools = [tool(fn) for fn in (
         say_hello,
         calculate,
         get_current_datetime,
@@ -216,8 +224,9 @@ def main():
         get_from_knowledge_base,
         store_user_preference,
         create_support_ticket,
+        get_open_tickets,
         perform_website_action 
-    ]
+    )]
 
     # Создание промпта для агента
     prompt = ChatPromptTemplate.from_messages(
@@ -228,6 +237,7 @@ def main():
                        "используй инструмент `store_user_preference` для их сохранения и старайся использовать их в будущих ответах для персонализации. "
                        "Всегда проверяй историю чата на предмет ранее сохраненных предпочтений. "
                        "Если пользователь просит о помощи с проблемой, которую ты не можешь решить напрямую, или требует дальнейшего рассмотрения, предложи создать тикет поддержки, используя инструмент `create_support_ticket`. "
+                       "Если пользователь спрашивает о своих обращениях, используй инструмент `get_open_tickets`. "
                        "Если пользователь просит выполнить действие на сайте (например, сбросить пароль, проверить статус заказа, обновить данные), используй инструмент `perform_website_action`."),
             ("placeholder", "{chat_history}"),
             ("human", "{input}"),
@@ -236,7 +246,8 @@ def main():
     )
 
     agent = create_tool_calling_agent(llm, tools, prompt)
-    agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
+    agent_executor = AgentExecutor(agent=agent, tools=tools, return_intermediate_steps=True)
+    cache = get_cache()
 
     # --- ЛОГИКА УПРАВЛЕНИЯ СЕССИЯМИ ---
     session_id = input("Введите ID сессии (или нажмите Enter для новой сессии): ").strip()
@@ -244,35 +255,48 @@ def main():
         session_id = str(uuid.uuid4())[:8] 
         print(f"Начата новая сессия с ID: {session_id}")
     
-    chat_history = load_session_history(session_id)
+    history = HistoryManager(session_store, summarizer=LLMSummarizer(llm))
+    chat_history = load_session_history(history, session_id)
     # --- КОНЕЦ ЛОГИКИ УПРАВЛЕНИЯ СЕССИЯМИ ---
 
+    # один цикл событий на всю сессию: асинхронный клиент модели привязан к нему
+    loop = asyncio.new_event_loop()
+
     print("\nВаш запрос: ")
     while True:
         try: 
             user_input = input()
             if user_input.lower() == "выход":
                 print("Завершение работы.")
-                save_session_history(session_id, chat_history) 
                 break
 
             print(f"\nОбрабатываю запрос: '{user_input}'\n")
 
-            response = agent_executor.invoke({"input": user_input, "chat_history": chat_history})
-            print(f"\nОтвет агента:\n{response['output']}\n")
+            output = try_fast_route(user_input)
+            if output is None:
+                print("\nОтвет агента:")
+                output = loop.run_until_complete(print_agent_answer(agent_executor, cache, user_input, chat_history))
+            else:
+                print(f"\nОтвет агента:\n{output}\n")
             
-            chat_history.extend([{"role": "user", "content": user_input}, {"role": "ai", "content": response["output"]}]) 
-            save_session_history(session_id, chat_history) 
+            save_session_turn(history, session_id, user_input, output)
+            chat_history = history.prompt_messages(session_id)
             
             print("\nВаш запрос:")
         except KeyboardInterrupt:
-            print("\nПрограмма прервана пользователем. Сохраняю историю...")
-            save_session_history(session_id, chat_history) 
+            print("\nПрограмма прервана пользователем.")
             break
         except Exception as e:
             print(f"Произошла непредвиденная ошибка: {e}")
             print("Пожалуйста, попробуйте еще раз.")
             pass 
 
+    loop.close()
+    log_cache_stats()
+    log.info("Маршрутизатор: %s", fast_router.stats())
+    if METRICS_DUMP:
+        metrics.dump_json(METRICS_DUMP)
+    session_store.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import sys, pathlib, asyncio, json
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from agent.batch import run_batch
+from agent.graph_builder import build_graph
+from agent.stub_llm import StubLLM
+
+
+class _Crash(BaseException):
+    """Имитация падения процесса посреди пакета."""
+
+
+class _FakeGraph:
+    def __init__(self, crash_after: int = None, tool: str = "get_from_knowledge_base"):
+        self.calls = []
+        self.crash_after = crash_after
+        self.tool = tool
+
+    async def ainvoke(self, state):
+        if self.crash_after is not None and len(self.calls) >= self.crash_after:
+            raise _Crash()
+        self.calls.append(state["user_input"])
+        await asyncio.sleep(0.01)
+        return {"response": f"ответ: {state['user_input']}",
+                "calls": [{"tool": self.tool, "args": state["user_input"]}]}
+
+
+def _write_inbox(path, n: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"id": f"m{i}", "message": f"Вопрос {i % (n // 2)}?"}, ensure_ascii=False) + "\n")
+        f.write("не json\n")
+
+
+def _read(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_with_stub_llm_dedupes_and_reports_throughput(tmp_path):
+    inbox, answers = tmp_path / "inbox.jsonl", tmp_path / "answers.jsonl"
+    _write_inbox(inbox, 40)
+    llm = StubLLM(latency=0.02)
+
+    report = run_batch(str(inbox), str(answers), build_graph(llm=llm), concurrency=10)
+
+    records = _read(answers)
+    assert sorted(r["id"] for r in records) == sorted(f"m{i}" for i in range(40))
+    assert report.processed == 20 and report.deduplicated == 20 and report.invalid == 1
+    assert sum("duplicate_of" in r for r in records) == 20
+    assert llm.calls == 2 * 20              # маршрутизатор + ответчик на уникальный вопрос
+    assert report.items_per_s > 40 / (20 * 2 * 0.02)   # быстрее последовательного прогона
+
+
+def test_batch_resumes_after_crash_without_repeating_work(tmp_path):
+    inbox, answers = tmp_path / "inbox.jsonl", tmp_path / "answers.jsonl"
+    _write_inbox(inbox, 200)
+
+    with pytest.raises(_Crash):
+        run_batch(str(inbox), str(answers), _FakeGraph(crash_after=30), concurrency=4, checkpoint_every=5)
+    first_run = _read(answers)
+    answered = {r["message"] for r in first_run}
+    assert 0 < len(answered) <= 30
+    with open(answers, "ab") as f:
+        f.write(b'{"id": "m9')          # недописанная строка в момент падения
+
+    graph = _FakeGraph()
+    report = run_batch(str(inbox), str(answers), graph, concurrency=4)
+
+    records = _read(answers)
+    ids = [r["id"] for r in records]
+    assert sorted(ids) == sorted(f"m{i}" for i in range(200))   # каждый ровно один раз
+    assert all("response" in r for r in records)
+    assert sorted(graph.calls) == sorted({f"Вопрос {i}?" for i in range(100)} - answered)   # без повторной работы
+    assert report.written == 200 - len(first_run)
+
+
+class _FlakyGraph(_FakeGraph):
+    def __init__(self, failing: set):
+        super().__init__()
+        self.failing = failing
+
+    async def ainvoke(self, state):
+        if state["user_input"] in self.failing:
+            raise RuntimeError("сбой LLM")
+        return await super().ainvoke(state)
+
+
+def test_failed_items_are_retried_on_resume(tmp_path):
+    inbox, answers = tmp_path / "inbox.jsonl", tmp_path / "answers.jsonl"
+    with open(inbox, "w", encoding="utf-8") as f:
+        for i in range(10):
+            f.write(json.dumps({"id": f"m{i}", "message": f"q{i}"}) + "\n")
+
+    first = run_batch(str(inbox), str(answers), _FlakyGraph({"q1"}), concurrency=2, checkpoint_every=1)
+    assert first.errors == 1 and first.processed == 9
+
+    graph = _FakeGraph()
+    second = run_batch(str(inbox), str(answers), graph, concurrency=2)
+    assert graph.calls == ["q1"] and second.processed == 1
+    final = {r["id"]: r for r in _read(answers)}   # последняя запись по id
+    assert final["m1"]["response"] == "ответ: q1"
+
+
+def test_personal_turns_are_not_shared_between_senders(tmp_path):
+    inbox = tmp_path / "inbox.jsonl"
+    with open(inbox, "w", encoding="utf-8") as f:
+        for i, sender in enumerate(("alice", "bob", "alice")):
+            f.write(json.dumps({"id": f"m{i}", "session_id": sender, "message": "Создайте тикет: не работает оплата"},
+                               ensure_ascii=False) + "\n")
+
+    for tool, runs in (("create_support_ticket", 3), ("get_from_knowledge_base", 1)):
+        graph = _FakeGraph(tool=tool)
+        report = run_batch(str(inbox), str(tmp_path / f"{tool}.jsonl"), graph, concurrency=3)
+        assert len(graph.calls) == runs and report.deduplicated == 3 - runs
+        assert all(r["tools"] == [tool] for r in _read(tmp_path / f"{tool}.jsonl"))
@@ -0,0 +1,98 @@
+import sys, pathlib, json, os
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent import cache as cache_mod
+from agent.cache import MISSING, LayeredCache, LRUCache, SQLiteCache, cached, make_key
+
+
+def test_key_normalization():
+    assert make_key("agent", "Сколько стоит доставка?") == make_key("agent", "  сколько стоит  ДОСТАВКА ")
+    assert make_key("agent", "доставка") != make_key("tool:x", "доставка")
+    assert make_key("agent", "Ёлка?!") == make_key("agent", "елка")
+
+
+def test_key_keeps_operators_symbols_and_currency():
+    for a, b in (("C++ vs C#", "C vs C"), ("2+2?", "2*2?"), ("цена в $", "цена в €"), ("a-b", "a b")):
+        assert make_key("tool:serper_search", a) != make_key("tool:serper_search", b)
+
+
+def test_lru_ttl_and_eviction():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set("a:1", 1); lru.set("a:2", 2); lru.get("a:1"); lru.set("a:3", 3)
+    assert lru.get("a:2") is MISSING and lru.get("a:1") == 1
+    lru.set("a:4", 4, ttl=-1)
+    assert lru.get("a:4") is MISSING
+
+
+def test_disk_tier_survives_restart_and_counts(tmp_path):
+    db = str(tmp_path / "cache.db")
+    first = LayeredCache(LRUCache(), SQLiteCache(db))
+    first.set(make_key("agent", "q"), {"answer": "a"})
+
+    second = LayeredCache(LRUCache(), SQLiteCache(db))
+    key = make_key("agent", "q")
+    assert second.get(key) == {"answer": "a"}   # с диска
+    assert second.get(key) == {"answer": "a"}   # уже из памяти
+    assert second.get(make_key("agent", "other")) is MISSING
+    assert second.stats()["agent"] == {"memory_hits": 1, "disk_hits": 1, "misses": 1}
+
+    second.invalidate("agent")
+    assert second.get(key) is MISSING
+
+
+def test_kb_dependent_entries_follow_file_version(tmp_path, monkeypatch):
+    from agent import knowledge_base
+
+    kb_file = tmp_path / "kb.json"
+    kb_file.write_text(json.dumps([{"category": "c", "question": "q", "answer": "1"}]), encoding="utf-8")
+    monkeypatch.setattr(knowledge_base, "KB_PATH", str(kb_file))
+    monkeypatch.setattr(knowledge_base.get_knowledge_base, "__defaults__", (str(kb_file),))
+    monkeypatch.setattr(cache_mod, "_cache", LayeredCache())
+
+    calls = []
+
+    @cached("tool:lookup", kb_dependent=True)
+    def lookup(query):
+        calls.append(query)
+        return knowledge_base.get_knowledge_base().exact(query)["answer"]
+
+    assert lookup("q") == "1" and lookup("Q?") == "1"
+    assert len(calls) == 1
+
+    kb_file.write_text(json.dumps([{"category": "c", "question": "q", "answer": "2"}]), encoding="utf-8")
+    st = kb_file.stat()
+    os.utime(kb_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert lookup("q") == "2"
+    assert len(calls) == 2
+
+
+def test_agent_answer_cache_is_scoped_to_chat_history():
+    import asyncio
+    from types import SimpleNamespace
+    from langchain_core.messages import AIMessage, HumanMessage
+    import main
+
+    class _Executor:
+        def __init__(self):
+            self.calls = 0
+
+        async def astream_events(self, inputs, config=None, version="v2"):
+            self.calls += 1
+            topic = inputs["chat_history"][0].content if inputs["chat_history"] else "—"
+            steps = [(SimpleNamespace(tool="get_from_knowledge_base"), "FAQ")]
+            yield {"event": "on_chain_end", "parent_ids": [],
+                   "data": {"output": {"output": f"гарантия на {topic}", "intermediate_steps": steps}}}
+
+    async def ask(executor, cache, history):
+        events = [e async for e in main.stream_agent_answer(executor, cache, "а какая на него гарантия?", history)]
+        return events[-1]["response"]
+
+    cache = LayeredCache(LRUCache())
+    executor = _Executor()
+    laptop = [HumanMessage("ноутбук"), AIMessage("Есть в наличии.")]
+    phone = [HumanMessage("телефон"), AIMessage("Есть в наличии.")]
+
+    assert asyncio.run(ask(executor, cache, laptop)) == "гарантия на ноутбук"
+    assert asyncio.run(ask(executor, cache, phone)) == "гарантия на телефон"   # чужая сессия — свой ответ
+    assert asyncio.run(ask(executor, cache, laptop)) == "гарантия на ноутбук"
+    assert executor.calls == 2                                                # та же история — из кэша
@@ -0,0 +1,54 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.history import HistoryManager, SUMMARY_PREFIX
+from agent.session_store import SessionStore
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, summary, messages):
+        self.calls += 1
+        return (summary + "|" if summary else "") + ",".join(m["content"] for m in messages)[-200:]
+
+
+def _fill(history, turns, session_id="s"):
+    for i in range(turns):
+        history.add_turn(session_id, f"вопрос {i} " + "x" * 60, f"ответ {i} " + "y" * 60)
+
+
+def test_window_stays_within_budget_and_folds_in_batches(tmp_path):
+    summarizer = CountingSummarizer()
+    history = HistoryManager(SessionStore(str(tmp_path), compact_every=0), budget_tokens=300,
+                             summarizer=summarizer)
+    _fill(history, 100)
+
+    messages = history.prompt_messages("s")
+    assert messages[0]["role"] == "system" and messages[0]["content"].startswith(SUMMARY_PREFIX)
+    assert sum(len(m["content"]) for m in messages[1:]) / 3 <= 300
+    assert messages[-1]["content"].startswith("ответ 99")
+    assert messages[1]["role"] == "user"
+    # нижняя отметка: резюмирование реже, чем раз в ход
+    assert 0 < summarizer.calls < 50
+
+
+def test_summary_and_window_survive_restart_and_compaction(tmp_path):
+    store = SessionStore(str(tmp_path), compact_every=0)
+    history = HistoryManager(store, budget_tokens=300, summarizer=CountingSummarizer())
+    _fill(history, 30)
+    expected = history.prompt_messages("s")
+
+    restarted = HistoryManager(SessionStore(str(tmp_path), compact_every=0), budget_tokens=300,
+                               summarizer=CountingSummarizer())
+    assert restarted.prompt_messages("s") == expected
+
+    assert store.compact("s")
+    records = store.load("s")
+    assert sum(r.get("type") == "summary" for r in records) == 1
+    assert len([r for r in records if "role" in r]) < 60   # свёрнутые в резюме реплики выброшены
+    assert not store.compact("s")   # повторно выбрасывать нечего — файл не переписывается
+    again = HistoryManager(SessionStore(str(tmp_path), compact_every=0), budget_tokens=300,
+                           summarizer=CountingSummarizer())
+    assert again.prompt_messages("s") == expected
@@ -0,0 +1,111 @@
+import sys, pathlib, json, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import httpx
+import pytest
+
+from agent.http_client import HttpClient, TokenBucket
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """Локальный сервер-заглушка: /ok, /flaky (первые 2 ответа — 503), /slow, /search, /actions."""
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.ports.add(self.client_address[1])
+            hits = server.hits[self.path]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        if self.path == "/flaky" and hits <= 2:
+            return self._reply(503, {"error": "busy"})
+        if self.path == "/slow":
+            time.sleep(0.2)
+        if self.path == "/search":
+            if self.headers.get("X-API-KEY") != "test-key":
+                return self._reply(403, {"error": "forbidden"})
+            return self._reply(200, {"answerBox": {"answer": f"ответ на {body['q']}"},
+                                     "organic": [{"snippet": "первый сниппет"}]})
+        if self.path == "/actions":
+            return self._reply(200, {"message": f"{body['action_type']}: {body['details']}",
+                                     "key": self.headers.get("Idempotency-Key")})
+        if self.path == "/missing":
+            return self._reply(404, {"error": "nope"})
+        self._reply(200, {"path": self.path, "hits": hits})
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    srv.lock, srv.hits, srv.ports = threading.Lock(), {}, set()
+    thread = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}"
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_keep_alive_reuses_one_connection(server):
+    client = HttpClient(rate_limit=0)
+    for _ in range(10):
+        assert client.get(f"{server.url}/ok")["path"] == "/ok"
+    assert len(server.ports) == 1
+
+
+def test_retries_5xx_with_backoff_then_succeeds(server):
+    client = HttpClient(rate_limit=0, backoff=0.01, retries=3)
+    assert client.get(f"{server.url}/flaky")["hits"] == 3
+    assert client.stats()["retries"] == 2
+
+    with pytest.raises(httpx.HTTPStatusError):
+        client.get(f"{server.url}/missing")   # 4xx не повторяется
+    assert server.hits["/missing"] == 1
+
+
+def test_identical_inflight_requests_are_coalesced(server):
+    client = HttpClient(rate_limit=0)
+    with ThreadPoolExecutor(8) as pool:
+        replies = list(pool.map(lambda _: client.get(f"{server.url}/slow"), range(8)))
+    assert all(r == replies[0] for r in replies)
+    assert server.hits["/slow"] == 1
+    assert client.stats()["coalesced"] == 7
+
+
+def test_token_bucket_limits_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0],
+                         sleep=lambda s: now.__setitem__(0, now[0] + s))
+    for _ in range(12):
+        bucket.acquire()
+    assert now[0] == pytest.approx(1.0)   # 2 сразу из запаса, ещё 10 — по 0.1 с
+
+
+def test_serper_and_website_tools_use_the_http_client(server, monkeypatch):
+    from tools.search import serper_search
+    from tools.website import perform_website_action
+
+    monkeypatch.setenv("SERPER_API_KEY", "test-key")
+    monkeypatch.setenv("SERPER_API_URL", f"{server.url}/search")
+    assert serper_search("доставка") == "ответ на доставка\nпервый сниппет"
+
+    monkeypatch.setenv("WEBSITE_API_URL", server.url)
+    assert perform_website_action("сброс пароля", "a@b.ru") == "сброс пароля: a@b.ru"
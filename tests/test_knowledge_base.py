@@ -0,0 +1,78 @@
+import sys, pathlib, json, os
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.knowledge_base import KnowledgeBase
+
+
+def _write(path, items):
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+
+ITEMS = [
+    {"category": "shipping", "question": "Сколько стоит доставка?", "answer": "250 рублей"},
+    {"category": "returns", "question": "Как вернуть товар?", "answer": "Через форму"},
+    {"category": "shipping", "question": "Когда прибудет мой заказ?", "answer": "3-5 дней"},
+]
+
+
+def test_exact_and_substring(tmp_path):
+    kb_file = tmp_path / "kb.json"
+    _write(kb_file, ITEMS)
+    kb = KnowledgeBase(str(kb_file))
+
+    assert kb.exact("  сколько СТОИТ доставка? ")["answer"] == "250 рублей"
+    assert [it["answer"] for it in kb.contains("доставк")] == ["250 рублей"]
+    assert len(kb.contains("shipping")) == 2   # совпадение по категории
+    assert kb.lookup("вернуть") == [ITEMS[1]]
+    assert kb.lookup("ка") != []               # короче n-граммы — полный проход
+    assert kb.lookup("гарантия") == []
+
+
+def test_hot_reload_on_mtime_change(tmp_path):
+    kb_file = tmp_path / "kb.json"
+    _write(kb_file, ITEMS[:1])
+    kb = KnowledgeBase(str(kb_file))
+    assert len(kb) == 1
+
+    _write(kb_file, ITEMS)
+    st = kb_file.stat()
+    os.utime(kb_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert len(kb) == 3
+    assert kb.exact("Как вернуть товар?") is not None
+
+    # битый файл — продолжаем отдавать последнюю корректную версию
+    kb_file.write_text("[{", encoding="utf-8")
+    os.utime(kb_file, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000))
+    assert len(kb) == 3
+
+
+def test_bm25_ranks_free_phrasing(tmp_path):
+    kb_file = tmp_path / "kb.json"
+    _write(kb_file, ITEMS)
+    kb = KnowledgeBase(str(kb_file))
+
+    ranked = kb.search("подскажите, сколько будет стоить доставку", threshold=0.0)
+    assert ranked[0][1]["answer"] == "250 рублей"
+    assert 0.0 < ranked[0][0] <= 1.0
+    assert [s for s, _ in ranked] == sorted((s for s, _ in ranked), reverse=True)
+
+    assert kb.search("когда придёт заказ", k=1, threshold=0.0)[0][1]["answer"] == "3-5 дней"
+    assert kb.search("погода в москве") == []
+    assert kb.search("сколько стоит доставка", threshold=1.01) == []
+
+
+def test_tool_returns_every_category_and_substring_match(tmp_path, monkeypatch):
+    import tools.knowledge_base as kb_tool
+    from agent.knowledge_base import KB_TOP_K
+
+    items = [{"category": "shipping", "question": f"Вопрос про доставку номер {i}?", "answer": f"ответ {i}"}
+             for i in range(KB_TOP_K + 2)] + [ITEMS[1]]
+    kb_file = tmp_path / "kb.json"
+    _write(kb_file, items)
+    kb = KnowledgeBase(str(kb_file))
+    monkeypatch.setattr(kb_tool, "get_knowledge_base", lambda: kb)
+
+    assert kb.category(" Shipping ") == items[:-1]
+    # top-k ограничивает только BM25: категория и подстрока отдают все совпадения
+    assert kb_tool.get_from_knowledge_base("shipping").count("Категория: shipping") == KB_TOP_K + 2
+    assert kb_tool.get_from_knowledge_base("оставку ном").count("Вопрос: ") == KB_TOP_K + 2
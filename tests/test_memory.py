@@ -0,0 +1,64 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent import memory
+from agent.memory import HashingEmbedder, NumpyStore, VectorMemory
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+
+class CountingStore(NumpyStore):
+    def __init__(self):
+        super().__init__(vector_size=64)
+        self.upserts = []
+
+    def upsert(self, ids, vectors, payloads):
+        self.upserts.append(len(ids))
+        super().upsert(ids, vectors, payloads)
+
+
+KB = [
+    {"category": "shipping", "question": "Сколько стоит доставка?", "answer": "250 рублей"},
+    {"category": "returns", "question": "Как вернуть товар?", "answer": "Через форму на сайте"},
+    {"category": "account", "question": "Как сбросить пароль?", "answer": "Ссылка придёт на почту"},
+]
+
+
+def test_import_does_not_connect():
+    assert memory.get_client.cache_info().currsize == 0
+
+
+def test_batched_index_and_filtered_search():
+    embedder, store = CountingEmbedder(), CountingStore()
+    mem = VectorMemory(embedder, store, embed_batch_size=2, upsert_batch_size=3)
+
+    mem.index_knowledge_base(KB)
+    mem.add_turns("s1", [{"role": "user", "content": "где моя доставка"},
+                         {"role": "ai", "content": "посылка в пути"}])
+    assert embedder.batches == [2, 1, 2]
+    assert store.upserts == [3, 2]
+    assert len(store) == 5
+
+    score, payload = mem.search("стоимость доставки", k=1, kind="kb")[0]
+    assert payload["question"] == "Сколько стоит доставка?" and score > 0
+    assert all(p["category"] == "returns" for _, p in mem.search("доставка", category="returns"))
+    assert {p["session"] for _, p in mem.search("доставка", session_id="s1")} == {"s1"}
+
+    # повторная загрузка — перезапись тех же точек, а не дубли
+    mem.index_knowledge_base(KB)
+    assert len(store) == 5
+
+
+def test_default_offline_memory_matches_embedder_dimension():
+    mem = VectorMemory(HashingEmbedder())
+    assert mem.store.vector_size == HashingEmbedder().dim
+    assert mem.index_knowledge_base(KB) == 3
+    assert mem.search("Как сбросить пароль?", k=1)[0][1]["category"] == "account"
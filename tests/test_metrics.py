@@ -0,0 +1,69 @@
+import sys, pathlib, json, urllib.request
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from agent.metrics import Metrics, metrics, serve_metrics
+
+
+def test_histogram_quantiles_and_exports():
+    m = Metrics(prefix="t")
+    for ms in range(1, 101):
+        m.observe("node_seconds", ms / 1000, node="planner")
+    m.inc("llm_calls", component="router")
+    m.inc("llm_tokens", 42, component="router", kind="output")
+
+    summary = m.histogram("node_seconds", node="planner")
+    assert summary["count"] == 100
+    assert summary["p50"] == pytest.approx(0.051)
+    assert summary["p95"] == pytest.approx(0.096)
+    assert summary["p99"] == pytest.approx(0.1)
+
+    text = m.prometheus()
+    assert 't_llm_tokens_total{component="router",kind="output"} 42' in text
+    assert 't_node_seconds_bucket{node="planner",le="0.05"} 50' in text
+    assert 't_node_seconds_bucket{node="planner",le="+Inf"} 100' in text
+    assert 't_node_seconds_recent{node="planner",quantile="0.99"} 0.100000' in text
+
+    snap = json.loads(json.dumps(m.snapshot()))
+    assert snap["counters"]["llm_calls"] == [{"labels": {"component": "router"}, "value": 1}]
+
+
+def test_graph_nodes_tools_and_llm_calls_are_measured():
+    from agent.graph_builder import build_graph
+    from agent.stub_llm import StubLLM
+
+    def count(name, **labels):
+        return metrics.histogram(name, **labels)["count"]
+
+    before = {n: count("graph_node_seconds", node=n) for n in ("planner", "executor", "responder")}
+    tool_before = count("tool_seconds", tool="say_hello")
+    llm_before = metrics.counter("llm_calls", component="responder")
+
+    build_graph(llm=StubLLM()).invoke({"user_input": "мир"})
+
+    assert all(count("graph_node_seconds", node=n) == before[n] + 1 for n in before)
+    assert count("tool_seconds", tool="say_hello") == tool_before + 1
+    assert metrics.counter("llm_calls", component="responder") == llm_before + 1
+    assert metrics.counter("llm_tokens", component="responder", kind="output_estimated") > 0
+
+
+def test_tools_are_silent_by_default(capsys):
+    from tools.website import perform_website_action
+
+    perform_website_action("проверить статус заказа", "12345")
+    assert capsys.readouterr().out == ""
+
+
+def test_metrics_http_endpoint():
+    m = Metrics()
+    m.inc("cache_lookups", namespace="agent", result="memory_hits")
+    server = serve_metrics(0, registry=m)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        text = urllib.request.urlopen(f"{base}/metrics").read().decode()
+        assert 'agent_cache_lookups_total{namespace="agent",result="memory_hits"} 1' in text
+        dump = json.loads(urllib.request.urlopen(f"{base}/metrics.json").read())
+        assert dump["counters"]["cache_lookups"][0]["value"] == 1
+    finally:
+        server.shutdown()
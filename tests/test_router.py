@@ -0,0 +1,58 @@
+import sys, pathlib, json
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import tools.knowledge_base, tools.say_hello, tools.website  # noqa: F401  (регистрация)
+from agent.knowledge_base import KnowledgeBase
+from agent.router import Router
+from agent.stub_llm import StubLLM
+
+KB = [
+    {"category": "shipping", "question": "Сколько стоит доставка?", "answer": "250 рублей"},
+    {"category": "returns", "question": "Как вернуть товар?", "answer": "Через форму"},
+]
+
+
+def _kb(tmp_path):
+    path = tmp_path / "kb.json"
+    path.write_text(json.dumps(KB, ensure_ascii=False), encoding="utf-8")
+    return KnowledgeBase(str(path))
+
+
+def test_rules_and_kb_skip_llm(tmp_path):
+    llm = StubLLM()
+    router = Router(kb=_kb(tmp_path), llm=llm)
+
+    route = router.route("Какой статус заказа №123456?")
+    assert (route.source, route.tool) == ("rule", "perform_website_action")
+    assert route.args == {"action_type": "проверить статус заказа", "details": "123456"}
+
+    route = router.route("Забыл пароль, почта ivan@example.com")
+    assert route.args == {"action_type": "сброс пароля", "details": "ivan@example.com"}
+
+    route = router.route("сколько стоит доставка")
+    assert (route.source, route.tool) == ("kb", "get_from_knowledge_base")
+
+    # правило без номера заказа не срабатывает — решает следующая стадия
+    assert router.route("где мой заказ").source != "rule"
+
+    assert llm.calls == 1
+    stats = router.stats()
+    assert stats["rule"] == 2 and stats["kb"] == 1 and stats["llm_calls"] == 1
+    assert stats["without_llm_ratio"] == 3 / 4
+
+
+def test_llm_fallback_picks_registry_tool(tmp_path):
+    llm = StubLLM(reply=lambda messages: '{"tool": "say_hello", "args": "Анна"}')
+    router = Router(kb=_kb(tmp_path), llm=llm)
+    route = router.route("расскажи анекдот")
+    assert (route.source, route.tool, route.args) == ("llm", "say_hello", "Анна")
+
+    router = Router(kb=_kb(tmp_path), llm=StubLLM(reply=lambda m: "не знаю"))
+    assert router.route("расскажи анекдот").source == "default"
+
+
+def test_plan_fans_out_rule_and_faq(tmp_path):
+    router = Router(kb=_kb(tmp_path), kb_confidence=0.2)
+    routes = router.plan("Статус заказа №123456 и сколько стоит доставка?")
+    assert [r.tool for r in routes] == ["perform_website_action", "get_from_knowledge_base"]
+    assert router.route("сколько стоит доставка").tool == "get_from_knowledge_base"
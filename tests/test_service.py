@@ -0,0 +1,85 @@
+import sys, pathlib, asyncio, time
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.graph_builder import build_graph
+from agent.service import AgentService, ServiceOverloaded
+from agent.stub_llm import StubLLM
+
+
+def test_sessions_run_concurrently_but_turns_in_order():
+    service = AgentService(build_graph(llm=StubLLM(latency=0.05)), max_concurrency=50)
+
+    async def run():
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(service.handle(f"s{i}", "мир") for i in range(20)))
+        parallel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(service.handle("same", str(i)) for i in range(4)))
+        serial = time.perf_counter() - start
+        return replies, parallel, serial
+
+    replies, parallel, serial = asyncio.run(run())
+    assert all("Привет, мир!" in r for r in replies)
+    assert parallel < 0.5          # 20 × 50 мс параллельно, а не 1 с
+    assert serial >= 4 * 0.05      # одна сессия — строго по очереди
+    assert service.pending == 0
+
+
+def test_backpressure_rejects_when_queue_full():
+    service = AgentService(build_graph(llm=StubLLM(latency=0.05)), max_concurrency=1, max_pending=2)
+
+    async def run():
+        return await asyncio.gather(*(service.handle(f"s{i}", "мир") for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, ServiceOverloaded) for r in results) == 1
+
+
+class _ConcurrencyStub(StubLLM):
+    """Заглушка, запоминающая максимум одновременных вызовов модели."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = self.peak = 0
+
+    async def _track(self, coro):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await coro
+        finally:
+            self.active -= 1
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return await self._track(super().ainvoke(messages, *args, **kwargs))
+
+    async def astream(self, messages, *args, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            async for chunk in super().astream(messages, *args, **kwargs):
+                yield chunk
+        finally:
+            self.active -= 1
+
+
+def test_llm_limit_covers_model_calls_not_tools(monkeypatch):
+    from tools import registry
+
+    def slow_hello(name: str) -> str:
+        time.sleep(0.2)
+        return f"Привет, {name}!"
+
+    monkeypatch.setitem(registry, "say_hello", slow_hello)
+    llm = _ConcurrencyStub(latency=0.02)
+    service = AgentService(build_graph(llm=llm), max_concurrency=1)
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(service.handle(f"s{i}", "мир") for i in range(4)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    assert llm.calls == 4 * 2 and llm.peak == 1   # маршрутизатор + ответчик, по одному за раз
+    assert elapsed < 4 * 0.2                       # инструменты идут параллельно, слоты не держат
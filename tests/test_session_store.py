@@ -0,0 +1,71 @@
+import sys, pathlib, json
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.session_store import SessionStore
+
+
+def test_append_and_load_recent(tmp_path):
+    store = SessionStore(str(tmp_path), compact_every=0)
+    for i in range(50):
+        store.append_turn("s1", f"вопрос {i}", f"ответ {i}")
+
+    assert len(store.load("s1")) == 100
+    recent = store.load_recent("s1", 3)
+    assert [r["content"] for r in recent] == ["ответ 48", "вопрос 49", "ответ 49"]
+    assert store.load_recent("nope", 3) == []
+
+
+def test_torn_tail_is_skipped_and_compacted(tmp_path):
+    store = SessionStore(str(tmp_path), compact_every=0)
+    store.append_turn("s1", "привет", "здравствуйте")
+    with open(store.path("s1"), "ab") as f:
+        f.write(b'{"role": "user", "cont')  # процесс упал посреди записи
+
+    assert len(store.load_recent("s1", 10)) == 2
+
+    fresh = SessionStore(str(tmp_path), compact_every=0)  # «перезапуск»
+    fresh.append_turn("s1", "снова я", "слушаю")
+    assert [r["content"] for r in fresh.load("s1")] == ["привет", "здравствуйте", "снова я", "слушаю"]
+
+    fresh.compact_in_background("s1").result()
+    assert pathlib.Path(fresh.path("s1")).read_bytes().count(b"\n") == 4
+    fresh.close()
+
+
+def test_compaction_skips_clean_files_and_keeps_concurrent_appends(tmp_path, monkeypatch):
+    import agent.session_store as session_store
+
+    store = SessionStore(str(tmp_path), compact_every=0)
+    store.append_turn("s1", "привет", "здравствуйте")
+    inode = pathlib.Path(store.path("s1")).stat().st_ino
+    assert not store.compact("s1")   # битых строк и резюме нет — файл не переписывается
+    assert pathlib.Path(store.path("s1")).stat().st_ino == inode
+
+    with open(store.path("s1"), "ab") as f:
+        f.write(b'{"role": "user", "cont')
+    fresh = SessionStore(str(tmp_path), compact_every=0)   # «перезапуск» после падения
+    fresh.append_turn("s1", "снова я", "слушаю")
+    compacted = session_store._compacted
+
+    def append_while_compacting(records):   # ход дописан, пока temp-файл собирается без блокировки
+        fresh.append_turn("s1", "ещё вопрос", "ещё ответ")
+        return compacted(records)
+
+    monkeypatch.setattr(session_store, "_compacted", append_while_compacting)
+    assert fresh.compact("s1")
+    assert [r["content"] for r in fresh.load("s1")] == [
+        "привет", "здравствуйте", "снова я", "слушаю", "ещё вопрос", "ещё ответ"]
+    assert pathlib.Path(fresh.path("s1")).read_bytes().count(b"\n") == 6
+    store.close()
+    fresh.close()
+
+
+def test_legacy_json_is_migrated(tmp_path):
+    legacy = [{"role": "user", "content": "Как тебя зовут?"}, {"role": "ai", "content": "Gemini"}]
+    (tmp_path / "old.json").write_text(json.dumps(legacy, ensure_ascii=False, indent=4), encoding="utf-8")
+
+    store = SessionStore(str(tmp_path))
+    assert store.exists("old")
+    assert store.load_recent("old", 10) == legacy
+    assert (tmp_path / "old.json.bak").exists() and not (tmp_path / "old.json").exists()
+    assert store.migrate_all() == []
@@ -0,0 +1,71 @@
+import sys, pathlib, asyncio, time
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.graph_builder import build_graph
+from agent.service import AgentService
+from agent.streaming import astream_agent, stream_graph
+from agent.stub_llm import StubLLM
+
+
+def test_graph_streams_tool_status_and_tokens_before_done():
+    graph = build_graph(llm=StubLLM())
+    events = list(stream_graph(graph, {"user_input": "мир"}))
+    kinds = [e["type"] for e in events]
+
+    assert kinds[:3] == ["plan", "tool_start", "tool_end"]
+    assert kinds[-1] == "done"
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == events[-1]["response"]
+    assert events[-1]["response"] == graph.invoke({"user_input": "мир"})["response"]
+
+
+def test_service_stream_delivers_first_token_before_generation_ends():
+    service = AgentService(build_graph(llm=StubLLM(latency=0.02, token_latency=0.02)))
+
+    async def run():
+        start, first_token, events = time.perf_counter(), None, []
+        async for event in service.stream("s1", "мир"):
+            if event["type"] == "token" and first_token is None:
+                first_token = time.perf_counter() - start
+            events.append(event)
+        return first_token, time.perf_counter() - start, events
+
+    ttft, total, events = asyncio.run(run())
+    assert events[-1]["type"] == "done" and "Привет, мир!" in events[-1]["response"]
+    assert ttft < total / 2
+    assert service.pending == 0
+
+
+def test_fast_route_streams_tool_output_as_single_token():
+    events = list(stream_graph(build_graph(llm=StubLLM()), {"user_input": "где мой заказ №12345?"}))
+    tokens = [e for e in events if e["type"] == "token"]
+    assert len(tokens) == 1 and "12345" in tokens[0]["content"]
+
+
+def test_agent_events_are_mapped_to_the_same_format():
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+    from langchain_core.tools import tool
+
+    @tool
+    def lookup(query: str) -> str:
+        """Ищет ответ в FAQ."""
+        return "3 дня"
+
+    model = GenericFakeChatModel(messages=iter([AIMessage(content="Доставка занимает 3 дня")]))
+    chain = (
+        RunnableLambda(lambda x: lookup.invoke(x["input"]))
+        | model
+        | RunnableLambda(lambda m: {"output": m.content, "intermediate_steps": []})
+    )
+
+    async def run():
+        return [e async for e in astream_agent(chain, {"input": "доставка"})]
+
+    events = asyncio.run(run())
+    kinds = [e["type"] for e in events]
+    assert kinds[:2] == ["tool_start", "tool_end"] and events[1]["output"] == "3 дня"
+    assert "".join(e["content"] for e in events if e["type"] == "token") == "Доставка занимает 3 дня"
+    assert events[-1]["response"] == "Доставка занимает 3 дня"
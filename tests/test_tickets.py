@@ -0,0 +1,97 @@
+import sys, pathlib, os
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from agent.tickets import TicketStore
+
+
+def test_created_tickets_are_readable_before_and_after_flush(tmp_path):
+    store = TicketStore(str(tmp_path / "t.db"), flush_interval=10)   # пачка не сбросится сама
+    try:
+        first = store.create("Не приходит письмо для сброса пароля", "Ivan@Example.com")
+        store.create("Заказ 123 не доставлен", "ivan@example.com")
+        store.create("Не работает оплата картой", "other@example.com")
+        assert len(first["id"]) == 36
+
+        open_now = store.open_tickets("ivan@example.com")
+        assert [t["description"] for t in open_now] == ["Заказ 123 не доставлен", "Не приходит письмо для сброса пароля"]
+
+        store.flush()
+        store.set_status(first["id"], "closed")
+        assert [t["description"] for t in store.open_tickets("ivan@example.com")] == ["Заказ 123 не доставлен"]
+        store.flush()
+        assert store.get(first["id"])["status"] == "closed"
+        assert store.count() == 3
+    finally:
+        store.close()
+
+
+def test_find_similar_matches_reworded_recent_issue(tmp_path):
+    store = TicketStore(str(tmp_path / "t.db"))
+    try:
+        ticket = store.create("Не приходит письмо для сброса пароля на почту", "ivan@example.com")
+        store.flush()
+
+        similar = store.find_similar("Письмо сброса пароля не приходит на почту!", "ivan@example.com")
+        assert [t["id"] for _, t in similar] == [ticket["id"]]
+        assert store.find_similar("Письмо сброса пароля не приходит на почту", "petr@example.com") == []
+        assert store.find_similar("Хочу вернуть товар", "ivan@example.com") == []
+        assert store.find_similar("Не приходит письмо сброса пароля на почту", "ivan@example.com", window=-1) == []
+        assert store.find_similar("Не приходит письмо для сброса пароля на почту") == []   # без клиента — не ищем
+
+        anon = store.create("Не работает оплата картой", session_id="alice")
+        assert [t["id"] for _, t in store.find_similar("Оплата картой не работает", session_id="alice")] == [anon["id"]]
+        assert store.find_similar("Оплата картой не работает", session_id="bob") == []
+    finally:
+        store.close()
+
+
+def test_journal_replays_writes_lost_in_a_crash(tmp_path):
+    path = str(tmp_path / "t.db")
+    store = TicketStore(path, flush_interval=10)
+    store._queue.put = lambda op: None   # пишущий поток не успевает записать пачку
+    ticket = store.create("Не работает оплата картой", "ivan@example.com")
+    os.write(store._journal_fd, b'{"op": "ins')   # недописанная строка в момент падения
+
+    other = TicketStore(path)   # второй процесс на той же базе: журнал живого владельца не трогает
+    try:
+        assert other.get(ticket["id"]) is None
+        assert os.path.getsize(store.journal_path) > 0
+    finally:
+        other.close()
+    assert not os.path.exists(other.journal_path)   # пустой журнал удаляется при закрытии
+
+    os.close(store._journal_fd)   # «падение»: владелец отпускает flock
+    reopened = TicketStore(path)
+    try:
+        assert reopened.get(ticket["id"])["description"] == "Не работает оплата картой"
+        assert reopened._pending == {}
+        assert not os.path.exists(store.journal_path)
+    finally:
+        reopened.close()
+
+
+def test_support_ticket_tool_dedupes(tmp_path, monkeypatch):
+    import agent.tickets as tickets
+    from tools.tickets import create_support_ticket, get_open_tickets
+
+    monkeypatch.setattr(tickets, "TICKET_DB_PATH", str(tmp_path / "t.db"))
+
+    created = create_support_ticket("Не приходит письмо для сброса пароля", "ivan@example.com")
+    assert "успешно создан" in created
+    again = create_support_ticket("Письмо для сброса пароля не приходит", "ivan@example.com")
+    assert "уже открыт" in again and created.split("№")[1].split()[0] in again
+    assert get_open_tickets("ivan@example.com").count("№") == 1
+
+
+def test_anonymous_sessions_never_see_each_others_tickets(tmp_path, monkeypatch):
+    import agent.tickets as tickets
+    from tools.tickets import create_support_ticket, find_similar_tickets
+
+    monkeypatch.setattr(tickets, "TICKET_DB_PATH", str(tmp_path / "anon.db"))
+
+    alice = create_support_ticket("Не работает оплата картой", session_id="alice")
+    bob = create_support_ticket("Не работает оплата картой", session_id="bob")
+    alice_id, bob_id = (reply.split("№")[1].split()[0] for reply in (alice, bob))
+    assert "успешно создан" in alice and "успешно создан" in bob and alice_id != bob_id
+    assert alice_id not in find_similar_tickets("Не работает оплата картой", session_id="bob")
+    assert "уже открыт" in create_support_ticket("Оплата картой не работает", session_id="alice")
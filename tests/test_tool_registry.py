@@ -0,0 +1,34 @@
+import sys, pathlib, subprocess
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+import tools
+from tools import load_manifest
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def test_manifest_is_cached_until_sources_change(tmp_path, monkeypatch):
+    path = str(tmp_path / "manifest.json")
+    first = load_manifest(path)
+    assert first["say_hello"]["module"] == "tools.say_hello"
+    assert first["perform_website_action"]["signature"] == "(action_type: str, details: str) -> str"
+
+    def no_scan(*args):
+        raise AssertionError("манифест должен читаться из кэша")
+
+    monkeypatch.setattr(tools, "_scan", no_scan)
+    assert load_manifest(path) == first
+
+
+def test_tool_module_imported_on_first_use():
+    code = (
+        "import sys\n"
+        "from tools import registry\n"
+        "assert 'say_hello' in registry and 'tools.say_hello' not in sys.modules\n"
+        "assert registry.describe('say_hello')['signature'] == '(name: str) -> str'\n"
+        "assert registry['say_hello']('мир') == 'Привет, мир!'\n"
+        "assert 'tools.say_hello' in sys.modules\n"
+        "import agent.graph_builder\n"
+        "assert 'langgraph' not in sys.modules and 'langchain_google_genai' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
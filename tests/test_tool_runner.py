@@ -0,0 +1,70 @@
+import sys, pathlib, asyncio, time
+sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
+
+from tools import register, registry
+from agent.tool_runner import arun_calls, run_calls
+
+
+@register
+def _slow_sync(delay: str) -> str:
+    time.sleep(float(delay))
+    return f"sync {delay}"
+
+
+@register
+async def _slow_async(delay: str) -> str:
+    await asyncio.sleep(float(delay))
+    return f"async {delay}"
+
+
+@register(timeout=0.05)
+def _stuck(_: str) -> str:
+    time.sleep(0.5)
+    return "никогда"
+
+
+@register
+def _broken(_: str) -> str:
+    raise ValueError("сломался")
+
+
+CALLS = [
+    {"tool": "_slow_sync", "args": "0.2"},
+    {"tool": "_slow_async", "args": "0.2"},
+    {"tool": "_slow_sync", "args": "0.1"},
+]
+
+
+def test_sync_fan_out_takes_max_not_sum():
+    start = time.perf_counter()
+    assert run_calls(CALLS) == ["sync 0.2", "async 0.2", "sync 0.1"]
+    assert time.perf_counter() - start < 0.4
+
+
+def test_async_fan_out_takes_max_not_sum():
+    start = time.perf_counter()
+    assert asyncio.run(arun_calls(CALLS)) == ["sync 0.2", "async 0.2", "sync 0.1"]
+    assert time.perf_counter() - start < 0.4
+
+
+def test_timeouts_errors_and_unknown_tools_do_not_break_the_turn():
+    calls = [{"tool": "_stuck", "args": ""}, {"tool": "_broken", "args": ""},
+             {"tool": "нет_такого", "args": ""}, {"tool": "_slow_sync", "args": "0"}]
+    for outputs in (run_calls(calls), asyncio.run(arun_calls(calls))):
+        assert "не ответил за 0.05 с" in outputs[0]
+        assert "сломался" in outputs[1]
+        assert "Неизвестный инструмент" in outputs[2]
+        assert outputs[3] == "sync 0"
+    assert "_stuck" in registry
+
+
+def test_on_done_fires_in_completion_order_for_both_runners():
+    calls = [{"tool": "_slow_sync", "args": "0.2"}, {"tool": "_slow_async", "args": "0.05"},
+             {"tool": "нет_такого", "args": ""}]
+    for run in (lambda cb: run_calls(calls, on_done=cb), lambda cb: asyncio.run(arun_calls(calls, on_done=cb))):
+        finished = []
+        start = time.perf_counter()
+        outputs = run(lambda call, output: finished.append((output, time.perf_counter() - start)))
+        assert outputs[:2] == ["sync 0.2", "async 0.05"]            # выводы — в порядке вызовов
+        assert [o for o, _ in finished][1:] == ["async 0.05", "sync 0.2"]
+        assert finished[1][1] < 0.15                                # не ждёт медленный вызов
@@ -1,5 +1,160 @@
-registry = {}
+"""
+Реестр инструментов агента.
 
-def register(fn):
-    registry[fn.__name__] = fn
-    return fn
+Инструменты модулей каталога tools/ описаны манифестом (имя, модуль,
+сигнатура, docstring), который строится разбором исходников через ast, без
+импорта, и кэшируется в tools/.manifest.json до изменения файлов. Модуль
+инструмента импортируется только при первом обращении к нему через registry.
+
+Каждый зарегистрированный инструмент обёрнут в agent.metrics.timed: время
+вызовов — в гистограмме tool_seconds{tool=...}, исключения — в tool_errors.
+"""
+
+import ast
+import importlib
+import inspect
+import json
+import os
+import threading
+from collections.abc import MutableMapping
+
+from agent.metrics import timed
+
+_TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(_TOOLS_DIR, ".manifest.json")
+MANIFEST_VERSION = 1
+
+
+# ── манифест ────────────────────────────────────────────────────────────
+def _tool_sources() -> dict:
+    return {
+        name[:-3]: os.path.join(_TOOLS_DIR, name)
+        for name in sorted(os.listdir(_TOOLS_DIR))
+        if name.endswith(".py") and name != "__init__.py"
+    }
+
+
+def _is_register(decorator) -> bool:
+    target = decorator.func if isinstance(decorator, ast.Call) else decorator
+    return (isinstance(target, ast.Name) and target.id == "register") or \
+           (isinstance(target, ast.Attribute) and target.attr == "register")
+
+
+def _scan(module: str, path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    entries = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and any(map(_is_register, node.decorator_list)):
+            returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+            entries.append({
+                "name": node.name,
+                "module": f"tools.{module}",
+                "signature": f"({ast.unparse(node.args)}){returns}",
+                "doc": ast.get_docstring(node) or "",
+                "async": isinstance(node, ast.AsyncFunctionDef),
+            })
+    return entries
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """{имя: описание}; пересобирается, только если файлы tools/ изменились."""
+    sources = _tool_sources()
+    stamps = {}
+    for module, src in sources.items():
+        st = os.stat(src)
+        stamps[module] = [st.st_mtime_ns, st.st_size]
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == MANIFEST_VERSION and cached.get("stamps") == stamps:
+            return cached["tools"]
+    except (OSError, ValueError):
+        pass
+
+    tools = {}
+    for module, src in sources.items():
+        for entry in _scan(module, src):
+            tools[entry["name"]] = entry
+    try:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "stamps": stamps, "tools": tools}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # каталог только для чтения — манифест просто не кэшируется
+    return tools
+
+
+# ── реестр ──────────────────────────────────────────────────────────────
+class ToolRegistry(MutableMapping):
+    """dict-подобный реестр: известные по манифесту инструменты импортируются при первом доступе."""
+
+    def __init__(self):
+        self._tools = {}
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    self._manifest = load_manifest()
+        return self._manifest
+
+    def __getitem__(self, name):
+        fn = self._tools.get(name)
+        if fn is None:
+            entry = self.manifest.get(name)
+            if entry is None:
+                raise KeyError(name)
+            importlib.import_module(entry["module"])  # @register кладёт функцию в _tools
+            fn = self._tools[name]
+        return fn
+
+    def __setitem__(self, name, fn):
+        self._tools[name] = fn
+
+    def __delitem__(self, name):
+        del self._tools[name]
+
+    def __contains__(self, name):
+        return name in self._tools or name in self.manifest
+
+    def __iter__(self):
+        return iter({**dict.fromkeys(self.manifest), **dict.fromkeys(self._tools)})
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def describe(self, name) -> dict:
+        """Имя, сигнатура и docstring без импорта модуля инструмента."""
+        if name in self.manifest:
+            return self.manifest[name]
+        fn = self._tools[name]
+        return {"name": name, "module": fn.__module__, "signature": str(inspect.signature(fn)),
+                "doc": inspect.getdoc(fn) or "", "async": inspect.iscoroutinefunction(fn)}
+
+    def load_all(self) -> None:
+        for entry in self.manifest.values():
+            importlib.import_module(entry["module"])
+
+
+registry = ToolRegistry()
+
+def register(fn=None, *, timeout: float = None):
+    """@register или @register(timeout=5) — таймаут инструмента в секундах."""
+    def wrap(f):
+        f = timed("tool", tool=f.__name__)(f)
+        if timeout is not None:
+            f.timeout = timeout
+        registry[f.__name__] = f
+        return f
+    return wrap(fn) if fn is not None else wrap
+
+def call(name, args):
+    """Вызов инструмента реестра: dict раскрывается в именованные аргументы."""
+    fn = registry[name]
+    return fn(**args) if isinstance(args, dict) else fn(args)
@@ -0,0 +1,47 @@
+import json
+import logging
+
+from agent.knowledge_base import get_knowledge_base, format_entry
+from tools import register
+
+log = logging.getLogger(__name__)
+
+@register
+def get_from_knowledge_base(query: str) -> str:
+    """Ищет ответ во внутренней базе знаний (FAQ): точное совпадение, категория, BM25, подстрока."""
+    log.debug("get_from_knowledge_base: %r", query)
+    try:
+        kb = get_knowledge_base()
+        hit = kb.exact(query)
+        if hit is not None:
+            log.debug("База знаний: точное совпадение")
+            return format_entry(hit)
+
+        # запрос-категория ("shipping") — все её записи, а не top-k BM25
+        in_category = kb.category(query)
+        if in_category:
+            log.debug("База знаний: категория, ответов %d", len(in_category))
+            return "\n\n".join(format_entry(item) for item in in_category)
+
+        # top-k — только для ранжированного BM25; подстрока отдаёт все совпадения
+        ranked = kb.search(query)
+        if ranked:
+            log.debug("База знаний: BM25, ответов %d, лучшая оценка %.2f", len(ranked), ranked[0][0])
+            return "\n\n".join(format_entry(item) for _, item in ranked)
+
+        found_answers = [format_entry(item) for item in kb.contains(query)]
+        if found_answers:
+            log.debug("База знаний: по подстроке, ответов %d", len(found_answers))
+            return "\n\n".join(found_answers)
+        else:
+            log.debug("База знаний: ответов не найдено")
+            return "Внутренняя база знаний не содержит информации по вашему запросу."
+    except FileNotFoundError:
+        log.error("Файл knowledge_base.json не найден")
+        return "Ошибка: Внутренняя база знаний недоступна."
+    except json.JSONDecodeError:
+        log.error("Ошибка чтения JSON файла knowledge_base.json")
+        return "Ошибка: Внутренняя база знаний повреждена."
+    except Exception as e:
+        log.exception("Ошибка в get_from_knowledge_base")
+        return f"Произошла ошибка при доступе к внутренней базе знаний: {e}"
@@ -0,0 +1,59 @@
+import logging
+import os
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from tools import register
+
+log = logging.getLogger(__name__)
+
+SERPER_API_URL = os.getenv("SERPER_API_URL", "https://google.serper.dev/search")
+SERPER_RATE_LIMIT = float(os.getenv("SERPER_RATE_LIMIT", "5"))  # запросов/с, по квоте тарифа
+SERPER_RESULTS = int(os.getenv("SERPER_RESULTS", "5"))
+
+
+@lru_cache(maxsize=None)
+def _client(url: str):
+    from agent.http_client import get_http_client  # httpx — только при первом поиске
+
+    client = get_http_client()
+    client.set_rate_limit(urlsplit(url).netloc, SERPER_RATE_LIMIT)
+    return client
+
+
+def format_results(results: dict, k: int = SERPER_RESULTS) -> str:
+    """Короткий текст из ответа Serper: прямой ответ, карточка знаний, сниппеты выдачи."""
+    parts = []
+    box = results.get("answerBox") or {}
+    answer = box.get("answer") or box.get("snippet") or box.get("snippetHighlighted")
+    if answer:
+        parts.append(" ".join(answer) if isinstance(answer, list) else str(answer))
+    graph = results.get("knowledgeGraph") or {}
+    if graph.get("description"):
+        parts.append(f"{graph.get('title', '')}: {graph['description']}".lstrip(": "))
+    for item in (results.get("organic") or [])[:k]:
+        if item.get("snippet"):
+            parts.append(item["snippet"])
+    return "\n".join(parts) or "Поиск не дал результатов."
+
+
+@register(timeout=30)
+def serper_search(query: str) -> str:
+    """Ищет актуальную информацию в интернете через Serper.dev (Google)."""
+    log.debug("serper_search: %r", query)
+
+    api_key = os.getenv("SERPER_API_KEY")
+    if not api_key:
+        log.error("SERPER_API_KEY не настроен, проверьте .env")
+        return "Ошибка: SERPER_API_KEY не настроен. Пожалуйста, проверьте файл .env."
+
+    url = os.getenv("SERPER_API_URL", SERPER_API_URL)
+    try:
+        # поиск идемпотентен — одинаковые одновременные запросы склеиваются в один
+        results = _client(url).post(url, json_body={"q": query}, headers={"X-API-KEY": api_key}, coalesce=True)
+        result = format_results(results or {})
+        log.debug("Serper API вернул: %.200s", result)
+        return result
+    except Exception as e:
+        log.warning("Ошибка Serper API: %s", e)
+        return f"Произошла ошибка при поиске информации: {e}"
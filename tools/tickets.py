@@ -0,0 +1,60 @@
+import logging
+
+from tools import register
+
+log = logging.getLogger(__name__)
+
+
+def _store():
+    from agent.tickets import get_ticket_store  # SQLAlchemy — только при первом обращении к тикетам
+
+    return get_ticket_store()
+
+
+@register
+def create_support_ticket(issue_description: str, user_email: str = None, session_id: str = None) -> str:
+    """Создаёт тикет поддержки; похожее открытое обращение того же клиента (email или сессия) за сутки не дублируется."""
+    log.debug("create_support_ticket: описание=%r, email=%r", issue_description, user_email)
+    store = _store()
+
+    similar = store.find_similar(issue_description, user_email, session_id)
+    if similar:
+        _, ticket = similar[0]
+        return (
+            f"Похожий тикет №{ticket['id']} уже открыт (статус: {ticket['status']}).\n"
+            f"Описание проблемы: '{ticket['description']}'.\n"
+            "Новый тикет не создан, специалист уже работает над обращением."
+        )
+
+    ticket = store.create(issue_description, user_email, session_id)
+    response_message = (
+        f"Тикет поддержки №{ticket['id']} успешно создан.\n"
+        f"Описание проблемы: '{issue_description}'.\n"
+    )
+    if user_email:
+        response_message += f"Подтверждение будет отправлено на ваш email: {user_email}."
+    else:
+        response_message += "Наш специалист свяжется с вами в ближайшее время."
+    return response_message
+
+
+@register
+def get_open_tickets(user_email: str) -> str:
+    """Открытые тикеты пользователя по email, новые первыми."""
+    tickets = _store().open_tickets(user_email)
+    if not tickets:
+        return f"Открытых тикетов для {user_email} нет."
+    from agent.tickets import format_ticket
+
+    return f"Открытые тикеты {user_email}:\n" + "\n".join(format_ticket(t) for t in tickets)
+
+
+@register
+def find_similar_tickets(issue_description: str, user_email: str = None, session_id: str = None) -> str:
+    """Недавние открытые тикеты клиента (по email или сессии), похожие на описание проблемы."""
+    from agent.tickets import format_ticket
+
+    similar = _store().find_similar(issue_description, user_email, session_id)
+    if not similar:
+        return "Похожих открытых обращений не найдено."
+    return "Похожие обращения:\n" + "\n".join(f"{format_ticket(t)} (сходство {s:.0%})" for s, t in similar)
@@ -0,0 +1,45 @@
+import logging
+import os
+import uuid
+
+from tools import register
+
+log = logging.getLogger(__name__)
+
+# адрес бэкенда сайта; без него действия только имитируются
+WEBSITE_API_URL = os.getenv("WEBSITE_API_URL", "")
+
+
+def _call_backend(base_url: str, action_type: str, details: str) -> str:
+    from agent.http_client import get_http_client
+
+    # один ключ идемпотентности на все повторы — бэкенд не выполнит действие дважды
+    reply = get_http_client().post(
+        f"{base_url.rstrip('/')}/actions",
+        json_body={"action_type": action_type, "details": details},
+        headers={"Idempotency-Key": str(uuid.uuid4())},
+    )
+    return (reply or {}).get("message") or f"Действие '{action_type}' выполнено."
+
+
+@register
+def perform_website_action(action_type: str, details: str) -> str:
+    """Выполняет действие на сайте: сброс пароля, статус заказа, обновление адреса."""
+    log.debug("perform_website_action: тип=%r, детали=%r", action_type, details)
+
+    base_url = os.getenv("WEBSITE_API_URL", WEBSITE_API_URL)
+    if base_url:
+        try:
+            return _call_backend(base_url, action_type, details)
+        except Exception as e:
+            log.warning("Ошибка бэкенда сайта: %s", e)
+            return f"Произошла ошибка при выполнении действия '{action_type}': {e}"
+    
+    if action_type.lower() == "сброс пароля":
+        return f"Действие '{action_type}' для {details} имитировано: Инструкции по сбросу пароля отправлены на {details}."
+    elif action_type.lower() == "проверить статус заказа":
+        return f"Действие '{action_type}' для заказа {details} имитировано: Статус заказа {details} - 'В обработке', ожидаемая дата доставки 2-3 дня."
+    elif action_type.lower() == "обновить адрес":
+        return f"Действие '{action_type}' для адреса '{details}' имитировано: Ваш адрес успешно обновлен до '{details}'."
+    else:
+        return f"Действие '{action_type}' с деталями '{details}' имитировано: Запрос на выполнение действия получен. Специалист скоро свяжется с вами."